@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+
+# ------------------ SORTED PURCHASE ENGINE ------------------
+# Purchase sorted once per filter selection, with the codes of a few
+# demographic columns carried along in the same order. Quantiles are index
+# lookups, the IQR fence for any multiplier is arithmetic on Q1/Q3, and the
+# rows above a fence are the tail slice past a binary search. Fences per
+# segment (e.g. Age x Category) regroup the same sorted values, see
+# SegmentFences below.
+
+CARRY_COLUMNS = ['Gender', 'Age', 'Category']
+# columns Stage 6 can segment the fences by
+SEGMENT_COLUMNS = ['Age', 'Gender', 'Category']
+
+
+class SortedPurchases:
+
+    def __init__(self, df, measure='Purchase', carry=CARRY_COLUMNS):
+        self.measure = measure
+        x = df[measure].to_numpy(dtype="float64")
+        order = np.argsort(x, kind="stable")
+        self.values = x[order]
+        self.codes = {}
+        self.labels = {}
+        for col in carry:
+            if col in df.columns:
+                self.codes[col] = df[col].cat.codes.to_numpy()[order]
+                self.labels[col] = list(df[col].cat.categories)
+        self.values.flags.writeable = False
+        self._segments = {}
+
+    def merged(self, df):
+        # a new structure with df's rows merged in: the new values are sorted
+        # and inserted by binary search, the existing ones are not re-sorted
+        new = SortedPurchases(df, self.measure, list(self.codes))
+        at = np.searchsorted(self.values, new.values, side="right")
+        out = SortedPurchases.__new__(SortedPurchases)
+        out.measure = self.measure
+        out.values = np.insert(self.values, at, new.values)
+        out.labels = {}
+        out.codes = {}
+        out._segments = {}
+        for col, codes in self.codes.items():
+            # the appended rows may bring labels the existing ones lack
+            labels = list(self.labels[col])
+            labels += [v for v in new.labels[col] if v not in labels]
+            remap = np.asarray([labels.index(v) for v in new.labels[col]], dtype=np.intp)
+            out.labels[col] = labels
+            out.codes[col] = np.insert(codes, at, remap[new.codes[col]].astype(codes.dtype))
+        out.values.flags.writeable = False
+        return out
+
+    def __len__(self):
+        return len(self.values)
+
+    def quantile(self, q):
+        # linear interpolation, same as Series.quantile
+        n = len(self.values)
+        if n == 0:
+            return float("nan")
+        pos = q * (n - 1)
+        lo = int(np.floor(pos))
+        hi = min(lo + 1, n - 1)
+        return float(self.values[lo] + (self.values[hi] - self.values[lo]) * (pos - lo))
+
+    def fence(self, mult=1.5):
+        q1, q3 = self.quantile(0.25), self.quantile(0.75)
+        return q1, q3, q3 + mult * (q3 - q1)
+
+    def split(self, threshold):
+        # index of the first value strictly above threshold
+        return int(np.searchsorted(self.values, threshold, side="right"))
+
+    def count_above(self, threshold):
+        return len(self.values) - self.split(threshold)
+
+    def histogram(self, threshold, bins=50):
+        # shared bin edges, and per-bin counts at or below / above threshold
+        edges = np.histogram_bin_edges(self.values, bins=bins)
+        split = self.split(threshold)
+        return edges, {"Normal": np.histogram(self.values[:split], edges)[0],
+                       "VIP": np.histogram(self.values[split:], edges)[0]}
+
+    def counts_above(self, threshold, col):
+        # per-label row counts of the tail above threshold
+        labels = self.labels[col]
+        counts = np.bincount(self.codes[col][self.split(threshold):], minlength=len(labels))
+        return pd.DataFrame({col: labels, "Count": counts})
+
+    def segments(self, by):
+        # fences per combination of the `by` columns, built once per grouping
+        # and kept with this structure (so in the anomaly cache)
+        by = tuple(by)
+        if by not in self._segments:
+            self._segments[by] = SegmentFences(self.values, self.codes, self.labels, by)
+        return self._segments[by]
+
+
+class SegmentFences:
+    # IQR fences per segment. The values arrive sorted, so a stable argsort
+    # of the segment codes groups them into sorted runs without sorting the
+    # values again, and the quartiles of every segment are one vectorized
+    # group_quantiles call. A fence multiplier is then arithmetic per
+    # segment and one comparison per row.
+
+    def __init__(self, values, codes, labels, by):
+        self.by = list(by)
+        code = np.zeros(len(values), dtype=np.int64)
+        for col in self.by:
+            code = code * len(labels[col]) + codes[col]
+        order = np.argsort(code, kind="stable")
+        self.values = values[order]
+        self.codes = {col: c[order] for col, c in codes.items()}
+        self.labels = labels
+        g = code[order]
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if len(g) else np.zeros(0, dtype=np.intp)
+        counts = np.diff(np.r_[starts, len(g)])
+        # segment of every value, and the quartiles of every segment
+        self.rank = np.repeat(np.arange(len(starts)), counts)
+        self.q1 = group_quantiles(self.values, starts, counts, 0.25)
+        self.q3 = group_quantiles(self.values, starts, counts, 0.75)
+
+        seg = g[starts]
+        table = {}
+        for col in reversed(self.by):
+            n = len(labels[col])
+            table[col] = np.asarray(labels[col], dtype=object)[seg % n]
+            seg = seg // n
+        self.table = pd.DataFrame({col: table[col] for col in self.by})
+        self.table["count"] = counts
+        self.table["q1"] = self.q1
+        self.table["q3"] = self.q3
+
+    def __len__(self):
+        return len(self.values)
+
+    def upper(self, mult=1.5):
+        return self.q3 + mult * (self.q3 - self.q1)
+
+    def flags(self, mult=1.5):
+        # per value: above its own segment's fence
+        return self.values > self.upper(mult)[self.rank]
+
+    def fences(self, mult=1.5):
+        out = self.table.copy()
+        out["upper"] = self.upper(mult)
+        out["above"] = np.bincount(self.rank[self.flags(mult)], minlength=len(out))
+        return out
+
+    def count_above(self, mult=1.5):
+        return int(self.flags(mult).sum())
+
+    def histogram(self, mult=1.5, bins=50):
+        edges = np.histogram_bin_edges(self.values, bins=bins)
+        vip = self.flags(mult)
+        return edges, {"Normal": np.histogram(self.values[~vip], edges)[0],
+                       "VIP": np.histogram(self.values[vip], edges)[0]}
+
+    def counts_above(self, mult, col):
+        labels = self.labels[col]
+        counts = np.bincount(self.codes[col][self.flags(mult)], minlength=len(labels))
+        return pd.DataFrame({col: labels, "Count": counts})
+
+
+# ------------------ GROUPED QUANTILES ------------------
+# One lexsort by (group, value) puts every group in a contiguous sorted run;
+# quantiles of all groups are then vectorized index arithmetic on the runs.
+
+def group_sorted(values, groups):
+    values = np.asarray(values, dtype="float64")
+    groups = np.asarray(groups)
+    order = np.lexsort((values, groups))
+    v, g = values[order], groups[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if len(g) else np.zeros(0, dtype=np.intp)
+    counts = np.diff(np.r_[starts, len(g)])
+    return v, g[starts], starts, counts, order
+
+
+def group_quantiles(v, starts, counts, q):
+    pos = q * (counts - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, counts - 1)
+    return v[starts + lo] + (v[starts + hi] - v[starts + lo]) * (pos - lo)
+
+
+# ------------------ MULTIVARIATE SCORING ------------------
+# An IsolationForest over a few numeric columns, trained once on a subsample
+# of the data and kept across appends. Rows are scored in fixed-size
+# batches, so scoring millions of them never holds more than one batch of
+# features. Lower scores are more anomalous.
+
+SCORE_FEATURES = ['Purchase', 'Age_Code', 'Gender_Code', 'Occupation']
+TRAIN_ROWS = 100_000
+SCORE_BATCH = 200_000
+
+
+class IsolationScorer:
+
+    def __init__(self, df, features=SCORE_FEATURES, train_rows=TRAIN_ROWS, seed=42):
+        from sklearn.ensemble import IsolationForest
+
+        self.features = [f for f in features if f in df.columns]
+        if len(df) > train_rows:
+            rows = np.random.default_rng(seed).choice(len(df), train_rows, replace=False)
+            df = df.take(np.sort(rows))
+        X = df[self.features].to_numpy(dtype="float64")
+        self.model = IsolationForest(random_state=seed, n_jobs=-1).fit(X)
+
+    def score(self, batches):
+        # batches: 2-d feature arrays; one float32 score per row, in order
+        parts = [self.model.score_samples(X).astype(np.float32) for X in batches if len(X)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def score_frame(self, df, size=SCORE_BATCH):
+        return self.score(df[self.features].iloc[start:start + size].to_numpy(dtype="float64")
+                          for start in range(0, len(df), size))
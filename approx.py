@@ -0,0 +1,167 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data import append_frame
+
+# ------------------ STRATIFIED SAMPLE ------------------
+# A sample drawn once per load, stratified by the sidebar filter columns
+# (Age x Gender x Category): each stratum gets its proportional share of
+# SAMPLE_ROWS, at least MIN_PER_STRATUM rows (all of them when smaller).
+# Every sidebar selection is a union of whole strata, so its row count is
+# known exactly, and sums / means are stratified estimates with 95%
+# confidence intervals. Appended rows are sampled at their stratum's rate,
+# so the rows of a stratum stay equally likely to be in the sample.
+
+SAMPLE_ROWS = int(os.environ.get("BF_SAMPLE_ROWS", 50_000))
+MIN_PER_STRATUM = 30
+STRATA = ['Age', 'Gender', 'Category']
+# customers are stratified by their (modal) age group and gender
+CUSTOMER_STRATA = ['Age', 'Gender']
+SAMPLE_COLUMNS = ['User_ID', 'Age', 'Gender', 'Category', 'Occupation', 'Purchase']
+Z = 1.96
+
+
+def quota(N, fraction):
+    # rows sampled from a stratum of N rows
+    return np.minimum(N, np.maximum(MIN_PER_STRATUM, np.rint(N * fraction))).astype(np.int64)
+
+
+def _draw(df, fraction, rng, rates=None, by=STRATA):
+    # positions of a sample of df stratified by the `by` columns, and the
+    # strata sizes; `rates` (sampled share per stratum) overrides the quota
+    # of the strata it has
+    keys = pd.MultiIndex.from_frame(df[by])
+    codes, strata = pd.factorize(keys)
+    N = np.bincount(codes)
+    take = quota(N, fraction)
+    if rates is not None:
+        rate = rates.reindex(pd.MultiIndex.from_tuples(list(strata), names=keys.names)).to_numpy()
+        known = ~np.isnan(rate)
+        take[known] = np.rint(N[known] * rate[known])
+    # random rank within each stratum; keep the first `take` of each
+    order = np.lexsort((rng.random(len(codes)), codes))
+    starts = np.r_[0, np.cumsum(N)[:-1]]
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[order] = np.arange(len(codes)) - np.repeat(starts, N)
+    rows = np.flatnonzero(rank < take[codes])
+    sizes = pd.Series(N, index=pd.MultiIndex.from_tuples(list(strata), names=keys.names))
+    return rows, sizes
+
+
+class StratifiedSample:
+
+    def __init__(self, df, n=SAMPLE_ROWS, seed=0):
+        self.fraction = min(1.0, n / max(len(df), 1))
+        self._rng = np.random.default_rng(seed)
+        rows, self.sizes = _draw(df, self.fraction, self._rng)
+        columns = [c for c in SAMPLE_COLUMNS if c in df.columns]
+        self.frame = df[columns].take(rows).reset_index(drop=True)
+
+    @classmethod
+    def from_rows(cls, rows, sizes, fraction, seed=0):
+        # a sample drawn elsewhere (e.g. in a query): its rows and the sizes
+        # of the strata (STRATA columns + N) it was drawn from
+        out = cls.__new__(cls)
+        out.fraction = fraction
+        out._rng = np.random.default_rng(seed)
+        out.frame = rows.reset_index(drop=True)
+        out.sizes = sizes.set_index(STRATA)["N"].astype(np.int64)
+        return out
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def population(self):
+        return int(self.sizes.sum())
+
+    def append(self, df):
+        if not len(df):
+            return self
+        n = self.frame.groupby(STRATA, observed=True).size()
+        rates = (n / self.sizes.reindex(n.index)).astype("float64")
+        rows, sizes = _draw(df, self.fraction, self._rng, rates)
+        new = df[list(self.frame.columns)].take(rows)
+        self.frame = append_frame(self.frame, new, None)
+        self.sizes = self.sizes.add(sizes, fill_value=0).astype(np.int64)
+        return self
+
+    def rows(self, selection=None, columns=None):
+        # the sampled rows inside a sidebar selection
+        df = self.frame if columns is None else self.frame[list(columns)]
+        if not selection:
+            return df
+        mask = np.ones(len(self.frame), dtype=bool)
+        for col in STRATA:
+            if col in selection:
+                mask &= self.frame[col].isin(selection[col]).to_numpy()
+        return df[mask]
+
+    def rollup(self, by=(), selection=None):
+        # Cube.rollup's columns (count, sum, mean) as estimates, plus the
+        # half-widths of their 95% intervals (count_ci, sum_ci, mean_ci)
+        by = [by] if isinstance(by, str) else list(by)
+        df = self.rows(selection)
+        y = df["Purchase"].to_numpy(dtype="float64")
+        s, strata = pd.factorize(pd.MultiIndex.from_frame(df[STRATA])) if len(df) else (np.zeros(0, np.intp), [])
+        if by:
+            g, groups = pd.factorize(pd.MultiIndex.from_frame(df[by]))
+        else:
+            g, groups = np.zeros(len(df), dtype=np.intp), [()]
+        S, G = len(strata), len(groups)
+
+        N = self.sizes.reindex(pd.MultiIndex.from_tuples(list(strata), names=STRATA)).to_numpy(dtype="float64") \
+            if S else np.zeros(0)
+        n = np.bincount(s, minlength=S).astype("float64")
+        cell = s * G + g
+        n_sg = np.bincount(cell, minlength=S * G).reshape(S, G).astype("float64")
+        s_sg = np.bincount(cell, weights=y, minlength=S * G).reshape(S, G)
+        q_sg = np.bincount(cell, weights=y * y, minlength=S * G).reshape(S, G)
+
+        w = (N / np.maximum(n, 1))[:, None]
+        # per-stratum variance factor N^2 (1 - n/N) / n, over the sample variance
+        c = (N ** 2 * (1 - n / np.maximum(N, 1)) / np.maximum(n, 1) / np.maximum(n - 1, 1))[:, None]
+
+        def var(su, su2):
+            # sum over strata of c * (sum u^2 - (sum u)^2 / n) for u = 0 outside the group
+            return (c * (su2 - su ** 2 / np.maximum(n, 1)[:, None])).sum(axis=0)
+
+        count = (w * n_sg).sum(axis=0)
+        total = (w * s_sg).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            r = np.nan_to_num(mean)
+            # ratio estimator, linearized: u = (y - mean) / count inside the group
+            var_mean = var((s_sg - r * n_sg) / count, (q_sg - 2 * r * s_sg + r * r * n_sg) / count ** 2)
+        out = pd.DataFrame(list(groups), columns=by) if by else pd.DataFrame(index=[0])
+        out["count"] = np.rint(count).astype(np.int64)
+        out["sum"] = total
+        out["mean"] = mean
+        out["count_ci"] = Z * np.sqrt(np.clip(var(n_sg, n_sg), 0, None))
+        out["sum_ci"] = Z * np.sqrt(np.clip(var(s_sg, q_sg), 0, None))
+        out["mean_ci"] = Z * np.sqrt(np.clip(var_mean, 0, None))
+        if not by:
+            return out
+        for col in by:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                out[col] = pd.Categorical(out[col], dtype=df[col].dtype)
+        out = out[out["count"] > 0].sort_values(by).reset_index(drop=True)
+        for col in by:
+            # plain labels, as Cube.rollup returns them
+            if isinstance(out[col].dtype, pd.CategoricalDtype):
+                out[col] = out[col].astype(object)
+        return out
+
+    def totals(self, selection=None):
+        row = self.rollup((), selection).iloc[0]
+        out = {k: row[k] for k in ("sum", "mean", "count_ci", "sum_ci", "mean_ci")}
+        return {"count": int(row["count"]), **out}
+
+
+def customer_sample(users, fraction, seed=0):
+    # sorted positions of a stratified sample of a customer table, drawn at
+    # the transaction sample's rate with the same per-stratum quota
+    rows, _ = _draw(users, fraction, np.random.default_rng(seed), by=CUSTOMER_STRATA)
+    return rows
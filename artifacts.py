@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ------------------ ARTIFACT CACHE ------------------
+# What pages compute for a filter selection (roll-ups, box statistics,
+# itemsets and rules, customer tables, anomaly fences, query results), kept
+# once per process and shared by every session. Keys carry the canonical
+# selection (filters.selection_key, so reordered or equivalent multiselect
+# picks share an entry) and the data version. Entries are evicted least
+# recently used once their estimated size passes ARTIFACT_MB. When several
+# sessions miss on the same key at once, one computes and the rest wait for it.
+#
+#   value = ARTIFACTS.get(("box_stats", sel_key, params, version), compute)
+
+ARTIFACT_MB = float(os.environ.get("BF_ARTIFACT_MB", 256))
+
+
+def nbytes(value):
+    # rough in-memory size of a cached value
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class ArtifactCache:
+
+    def __init__(self, max_mb=ARTIFACT_MB):
+        self.max_bytes = int(max_mb * 2 ** 20)
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._pending = {}  # key -> Event, while one session computes it
+        self._counts = {}  # kind -> [hits, misses]
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        # key[0] is the artifact kind the counters are kept under
+        while True:
+            with self._lock:
+                counts = self._counts.setdefault(key[0], [0, 0])
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    counts[0] += 1
+                    return self._entries[key][0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    counts[1] += 1
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # another session is computing it; take its result (or, if it
+            # failed, compute it here)
+            pending.wait()
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self._counts[key[0]][0] += 1
+                    return self._entries[key][0]
+                if key in self._pending:
+                    continue
+                self._counts[key[0]][1] += 1
+                pending = self._pending[key] = threading.Event()
+                break
+
+        try:
+            value = compute()
+            size = nbytes(value)
+            with self._lock:
+                if size <= self.max_bytes:
+                    self._entries[key] = (value, size)
+                    self.bytes += size
+                    self._trim()
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def _trim(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        # per kind: hits, misses, hit rate, entries held and their size
+        with self._lock:
+            held = {}
+            for key, (_, size) in self._entries.items():
+                n, b = held.get(key[0], (0, 0))
+                held[key[0]] = (n + 1, b + size)
+            rows = []
+            for kind, (hits, misses) in sorted(self._counts.items()):
+                n, b = held.get(kind, (0, 0))
+                rows.append({"artifact": kind, "hits": hits, "misses": misses,
+                             "hit_rate": hits / max(hits + misses, 1), "entries": n, "MB": b / 2 ** 20})
+            return rows
+
+
+ARTIFACTS = ArtifactCache()
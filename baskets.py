@@ -0,0 +1,58 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from mlxtend.frequent_patterns import association_rules
+
+# ------------------ BASKETS ------------------
+# Every transaction is the basket {Category=.., Age=.., Gender=..}.
+
+BASKET_COLUMNS = ['Category', 'Age', 'Gender']
+
+
+# ------------------ MINING ------------------
+# Itemsets are mined once per selection at the sliders' floor. A higher
+# support is then a filter over the cached itemsets and a higher confidence a
+# filter over the cached rules: a rule's support is the support of its full
+# itemset, which bounds both sides from below, so the filtered rules are
+# exactly what re-mining at the higher thresholds would return.
+
+MIN_SUPPORT = 0.01
+MIN_CONFIDENCE = 0.1
+
+
+# ------------------ ITEMSETS FROM THE CUBE ------------------
+# Every basket holds exactly one item per column, so the count of an itemset
+# is the cube roll-up over its columns with the other columns summed out.
+# That is exact, needs no pass over the rows, and stays current as appended
+# transactions are added to the cube.
+
+def itemset_counts(cube, selection=None, cols=BASKET_COLUMNS):
+    parts = []
+    for r in range(1, len(cols) + 1):
+        for combo in combinations(cols, r):
+            counts = cube.rollup(list(combo), selection)
+            items = zip(*[f"{c}=" + counts[c].astype(str) for c in combo])
+            parts.append(pd.DataFrame({"itemsets": [frozenset(t) for t in items],
+                                       "count": counts["count"].to_numpy(dtype=np.int64)}))
+    return pd.concat(parts, ignore_index=True)
+
+
+def mine_cube(cube, selection=None, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE):
+    # same (freq, rules) as mine() on the selected rows
+    freq = itemset_counts(cube, selection)
+    n = cube.totals(selection)["count"]
+    freq.insert(0, "support", freq["count"] / max(n, 1))
+    freq = freq[freq["support"] >= min_support].reset_index(drop=True)
+    if freq.empty:
+        return freq, pd.DataFrame()
+    rules = association_rules(freq.drop(columns="count"), metric="confidence", min_threshold=min_confidence)
+    return freq, rules
+
+
+def filter_mined(freq, rules, support, confidence):
+    freq = freq[freq["support"] >= support]
+    if rules.empty:
+        return freq, rules
+    rules = rules[(rules["support"] >= support) & (rules["confidence"] >= confidence)]
+    return freq, rules.reset_index(drop=True)
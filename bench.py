@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import stages
+
+# ------------------ HEADLESS PAGE BENCHMARK ------------------
+# Drives app.py through Streamlit's AppTest, one sidebar page (and a few
+# slider/filter positions) at a time, and records rerun latency, peak resident
+# memory (this process plus its job workers) and the Plotly JSON sent per rerun. Each data scale runs in its own
+# subprocess because the data source is read from the environment at import.
+#
+#   python bench.py --rows 10000 100000 --out bench.json
+#   python bench.py --rows 10000 --baseline bench.json --threshold 0.25
+#   python bench.py --imports
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# sidebar title of each page, by its module in stages/
+PAGE = {module: title for title, module in stages.PAGES.items()}
+
+SUBSET = {"Age": ["26-35"], "Gender": ["Female"]}
+
+# (scenario name, page, sidebar filters, {widget label: value})
+SCENARIOS = [(p.split(":")[0], p, None, {}) for p in stages.PAGES] + [
+    ("Stage 3 subset", PAGE["eda"], SUBSET, {}),
+    ("Stage 4 k=5", PAGE["clusters"], None, {"Select Number of Clusters (K)": 5}),
+    ("Stage 4 subset", PAGE["clusters"], SUBSET, {}),
+    ("Stage 5 strict", PAGE["rules"], None, {"Support": 0.1, "Confidence": 0.8}),
+    ("Stage 6 mult=2.5", PAGE["anomalies"], None, {"Sensitivity": 2.5}),
+    ("Stage 7 subset", PAGE["insights"], SUBSET, {}),
+]
+
+# absolute slack below which a slower run is treated as noise
+MIN_DELTA = {"warm_s": 0.05, "peak_rss_mb": 20.0, "payload_kb": 10.0}
+# how often resident memory is sampled while a scenario runs
+RSS_EVERY_S = 0.02
+
+
+def _widget(at, label):
+    for kind in ("slider", "radio", "multiselect", "selectbox"):
+        for w in getattr(at, kind):
+            if w.label == label:
+                return w
+    raise KeyError(label)
+
+
+def _drive(at, page, filters, widgets):
+    _widget(at, "📊 Navigation").set_value(page)
+    for label in ("Age", "Gender", "Category"):
+        w = _widget(at, label)
+        w.set_value((filters or {}).get(label, list(w.options)))
+    at.run()
+    for label, value in widgets.items():
+        _widget(at, label).set_value(value)
+    if widgets:
+        at.run()
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].message}")
+
+
+def _payload(at):
+    return sum(len(e.proto.spec) for e in at.get("plotly_chart"))
+
+
+def _rss_kb(pid):
+    # resident KB of a process and all of its descendants, from /proc (Linux;
+    # 0 elsewhere)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        children = []
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children += f.read().split()
+    except (OSError, StopIteration):
+        return 0
+    return kb + sum(_rss_kb(int(c)) for c in children)
+
+
+class PeakRSS:
+    # highest resident memory of this process tree, sampled on a thread, so
+    # the spawned job workers and the cold computation are both counted
+
+    def __init__(self, every=RSS_EVERY_S):
+        self.every = every
+        self.peak_kb = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while True:
+            self.peak_kb = max(self.peak_kb, _rss_kb(os.getpid()))
+            if self._stop.wait(self.every):
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_scale(rows, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    results = []
+    for name, page, filters, widgets in SCENARIOS:
+        at = AppTest.from_file(APP, default_timeout=600)
+        at.run()
+
+        with PeakRSS() as rss:
+            # first visit: whatever this scenario does not share with earlier ones
+            t0 = time.perf_counter()
+            _drive(at, page, filters, widgets)
+            cold = time.perf_counter() - t0
+
+            # warm reruns: the same view re-rendered, as on an unrelated widget change
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                at.run()
+                times.append(time.perf_counter() - t0)
+
+        results.append({
+            "rows": rows,
+            "scenario": name,
+            "page": page,
+            "cold_s": round(cold, 4),
+            "warm_s": round(statistics.median(times), 4),
+            "peak_rss_mb": round(rss.peak_kb / 1024, 1),
+            "payload_kb": round(_payload(at) / 1024, 1),
+        })
+    return results
+
+
+SHELL_IMPORTS = "import streamlit, perf, resources, ui, stages"
+
+
+def _importtime(code):
+    # top-level (module, cumulative us) from `python -X importtime`, in order
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         cwd=os.path.dirname(APP), capture_output=True, text=True, check=True)
+    entries = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            entries.append((name.strip(), int(cumulative)))
+    return entries
+
+
+def import_times():
+    # what the shell costs on a cold start, then what each page adds on top
+    shell = _importtime(SHELL_IMPORTS)
+    rows = [("app shell", shell)]
+    for mod in stages.PAGES.values():
+        entries = _importtime(f"{SHELL_IMPORTS}; import stages.{mod}")
+        rows.append((f"stages.{mod}", entries[len(shell):]))
+
+    report = []
+    for name, entries in rows:
+        entries.sort(key=lambda e: -e[1])
+        report.append({
+            "module": name,
+            "total_ms": round(sum(c for _, c in entries) / 1000, 1),
+            "heaviest": [f"{n} {c / 1000:.0f}ms" for n, c in entries[:4]],
+        })
+    return report
+
+
+def compare(results, baseline, threshold):
+    base = {(r["rows"], r["scenario"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get((r["rows"], r["scenario"]))
+        if b is None:
+            continue
+        for metric, slack in MIN_DELTA.items():
+            if metric not in b:
+                # a baseline from before the metric was recorded
+                continue
+            new, old = r[metric], b[metric]
+            if new > old * (1 + threshold) and new - old > slack:
+                regressions.append(f"{r['scenario']} @ {r['rows']:,} rows: {metric} {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each dashboard page headlessly.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--imports", action="store_true", help="only report the import-time breakdown")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.imports:
+        for r in import_times():
+            print(f"{r['module']:<22} {r['total_ms']:>8.1f} ms   {', '.join(r['heaviest'])}")
+        return
+
+    if args.worker:
+        json.dump(run_scale(args.rows[0], args.repeat), sys.stdout)
+        return
+
+    results = []
+    for rows in args.rows:
+        # block on background jobs and skip the disk store, so cold runs time
+        # the computation itself
+        env = dict(os.environ, BF_ROWS=str(rows), BF_JOB_WAIT="600", BF_STORE="0")
+        env.pop("BF_DATA", None)
+        out = subprocess.run(
+            [sys.executable, __file__, "--worker", "--rows", str(rows), "--repeat", str(args.repeat)],
+            env=env, check=True, capture_output=True, text=True,
+        )
+        results += json.loads(out.stdout)
+
+    report = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    for r in results:
+        print(f"{r['rows']:>10,}  {r['scenario']:<18} cold {r['cold_s']:>8.3f}s  warm {r['warm_s']:>7.3f}s  "
+              f"peak {r['peak_rss_mb']:>8.1f} MB  plotly {r['payload_kb']:>8.1f} KB", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
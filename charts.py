@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from anomaly import group_quantiles, group_sorted
+
+# ------------------ SERVER-SIDE CHARTS ------------------
+# Large charts are reduced on the server before they reach Plotly: histograms
+# send bin counts, box plots send per-group quartiles and whiskers, and
+# scatters send a capped stratified sample drawn with WebGL. Each chart takes
+# its own `budget` of raw points.
+
+TEMPLATE = 'plotly_dark'
+HIST_BINS = 50
+POINT_BUDGET = 5_000
+
+
+def binned(edges, counts, x="Purchase", color="Type"):
+    # counts: {label: per-bin counts over `edges`}, however they were counted
+    centers = (edges[:-1] + edges[1:]) / 2
+    hist = pd.DataFrame({
+        x: np.tile(centers, len(counts)),
+        "count": np.concatenate(list(counts.values())) if counts else [],
+        color: np.repeat(list(counts.keys()), len(centers)),
+    })
+    fig = px.bar(hist, x=x, y="count", color=color, template=TEMPLATE)
+    fig.update_layout(bargap=0)
+    return fig
+
+
+def box_stats(df, x, y, color):
+    # quartiles and 1.5 IQR whiskers per (x, color) group from one sorted pass
+    xc, cc = df[x].cat.codes.to_numpy(), df[color].cat.codes.to_numpy()
+    c_labels = list(df[color].cat.categories)
+    v, g, starts, counts, _ = group_sorted(df[y].to_numpy(), xc.astype(np.int64) * len(c_labels) + cc)
+    q1, med, q3 = (group_quantiles(v, starts, counts, q) for q in (0.25, 0.5, 0.75))
+
+    # whiskers: most extreme values still inside the fences of their group
+    iqr = q3 - q1
+    rank = np.repeat(np.arange(len(starts)), counts)
+    inside = (v >= (q1 - 1.5 * iqr)[rank]) & (v <= (q3 + 1.5 * iqr)[rank])
+    lower = np.minimum.reduceat(np.where(inside, v, np.inf), starts) if len(v) else v
+    upper = np.maximum.reduceat(np.where(inside, v, -np.inf), starts) if len(v) else v
+    return pd.DataFrame({
+        x: pd.Categorical.from_codes(g // len(c_labels), dtype=df[x].dtype),
+        color: pd.Categorical.from_codes(g % len(c_labels), dtype=df[color].dtype),
+        "q1": q1, "median": med, "q3": q3, "lower": lower, "upper": upper,
+    })
+
+
+def box_figure(stats, x, y, color):
+    # stats: one row per (x, color) group, both categorical, as box_stats returns
+    fig = go.Figure()
+    for label in stats[color].cat.categories:
+        g = stats[stats[color] == label].sort_values(x)
+        if not len(g):
+            continue
+        fig.add_trace(go.Box(
+            name=label, x=list(g[x]),
+            q1=g["q1"], median=g["median"], q3=g["q3"], lowerfence=g["lower"], upperfence=g["upper"],
+            boxpoints=False,
+        ))
+    fig.update_layout(template=TEMPLATE, boxmode="group", xaxis_title=x, yaxis_title=y, legend_title=color)
+    return fig
+
+
+def sample_rows(codes, budget=POINT_BUDGET, seed=0):
+    # sorted positions of at most `budget` rows, allocated to the groups in
+    # `codes` by their share
+    if len(codes) <= budget:
+        return np.arange(len(codes))
+    rng = np.random.default_rng(seed)
+    counts = np.bincount(codes)
+    take = np.floor(counts * budget / len(codes)).astype(np.int64)
+    picked = [rng.choice(np.flatnonzero(codes == c), t, replace=False) for c, t in enumerate(take) if t]
+    return np.sort(np.concatenate(picked))
+
+
+def sample(df, by, budget=POINT_BUDGET, seed=0):
+    if len(df) <= budget:
+        return df
+    codes = df[by].cat.codes.to_numpy() if isinstance(df[by].dtype, pd.CategoricalDtype) \
+        else pd.factorize(df[by])[0]
+    return df.take(sample_rows(codes, budget, seed))
+
+
+def scatter(df, x, y, color, budget=POINT_BUDGET, total=None, **kwargs):
+    # `total` is the population size when `df` was already sampled by the caller
+    shown = sample(df, color, budget)
+    total = len(df) if total is None else total
+    fig = px.scatter(shown, x=x, y=y, color=color, render_mode="webgl", template=TEMPLATE, **kwargs)
+    if len(shown) < total:
+        fig.add_annotation(text=f"showing {len(shown):,} of {total:,} points (stratified by {color})",
+                           xref="paper", yref="paper", x=1, y=1.08, showarrow=False, font=dict(size=11))
+    return fig
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from threadpoolctl import threadpool_limits
+
+# ------------------ ELBOW SWEEP ------------------
+
+K_RANGE = range(1, 8)
+ELBOW_MODES = ["Exact", "MiniBatch", "Sampled"]
+# frames above this size get a hint to switch to one of the approximate modes
+LARGE_ROWS = 200_000
+SAMPLE_ROWS = 50_000
+
+
+def _inertia(X, k, mode, seed):
+    if mode == "MiniBatch":
+        model = MiniBatchKMeans(n_clusters=k, n_init=3, batch_size=4096, random_state=seed)
+    else:
+        model = KMeans(n_clusters=k, n_init=10, random_state=seed)
+    model.fit(X)
+    return float(model.inertia_)
+
+
+def elbow_curve(X, k_range=K_RANGE, mode="Exact", sample_rows=SAMPLE_ROWS, n_jobs=-1, seed=42):
+    # WCSS for every k, the k values fitted concurrently
+    X = np.asarray(X, dtype="float64")
+    k_range = [k for k in k_range if k <= len(X)]
+    scale = 1.0
+    if mode == "Sampled" and len(X) > sample_rows:
+        rng = np.random.default_rng(seed)
+        # report WCSS on the scale of the full frame
+        scale = len(X) / sample_rows
+        X = X[rng.choice(len(X), sample_rows, replace=False)]
+    # KMeans releases the GIL, so threads share X without copies; one OpenMP
+    # thread per fit keeps the k values from oversubscribing the cores
+    with threadpool_limits(limits=1):
+        wcss = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_inertia)(X, k, mode, seed) for k in k_range
+        )
+    return list(k_range), [w * scale for w in wcss]
+
+
+def find_knee(ks, wcss):
+    # Kneedle: the point furthest below the chord of the normalized curve
+    ks = np.asarray(ks, dtype="float64")
+    y = np.asarray(wcss, dtype="float64")
+    if len(ks) < 3 or y[0] == y[-1]:
+        return int(ks[0])
+    x_n = (ks - ks[0]) / (ks[-1] - ks[0])
+    y_n = (y - y[-1]) / (y[0] - y[-1])
+    gap = (1 - x_n) - y_n
+    return int(ks[int(np.argmax(gap))])
+
+
+# ------------------ INTERACTIVE CLUSTERING ------------------
+
+SEGMENT_LABELS = ["Low", "Mid", "High", "VIP", "Elite"]
+
+def assign(X, centroids):
+    # nearest centroid per row: |x|^2 - 2 x.c + |c|^2, no per-row Python
+    X = np.asarray(X, dtype="float64")
+    d = (centroids ** 2).sum(axis=1) - 2.0 * X @ centroids.T
+    return d.argmin(axis=1).astype(np.int8)
+
+
+def rank_segments(cluster, spend, k):
+    # clusters renumbered by average spend (0 = lowest); empty ones are skipped
+    n = np.bincount(cluster, minlength=k)
+    avg = np.bincount(cluster, weights=spend, minlength=k) / np.maximum(n, 1)
+    present = np.flatnonzero(n)
+    order = present[np.argsort(avg[present], kind="stable")]
+    rank = np.zeros(k, dtype=np.int8)
+    rank[order] = np.arange(len(order))
+    return rank[cluster], len(order)
+
+
+class ModelCache:
+    # fitted centroids per (dataset version, filter selection, features, k)
+    # in a bounded LRU; a miss warm-starts from the centroids last fitted for
+    # the same selection, features and k of the same source (an earlier
+    # version, before an append) instead of running n_init random restarts
+
+    def __init__(self, size=32):
+        self.size = size
+        self._models = OrderedDict()
+        self._last = OrderedDict()
+        self._lock = threading.Lock()
+
+    def centroids(self, ds, sel_key, features, k, X, seed=42):
+        # ds: the store's (source, fingerprint) key of the data X came from
+        key = (ds, sel_key, tuple(features), k)
+        warm = (ds[0], sel_key, tuple(features), k)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            init = self._last.get(warm)
+
+        if init is not None:
+            model = KMeans(n_clusters=k, init=init, n_init=1, random_state=seed)
+        else:
+            model = KMeans(n_clusters=k, n_init=10, random_state=seed)
+        model.fit(X)
+        centroids = model.cluster_centers_
+        centroids.flags.writeable = False
+
+        with self._lock:
+            self._models[key] = centroids
+            self._last[warm] = centroids
+            self._last.move_to_end(warm)
+            for lru in (self._models, self._last):
+                if len(lru) > self.size:
+                    lru.popitem(last=False)
+        return centroids
@@ -0,0 +1,216 @@
+import numpy as np
+import pandas as pd
+
+# ------------------ AGGREGATE CUBES ------------------
+# Sufficient statistics kept per cell of a few low-cardinality dimensions,
+# built in bincount passes once per load. Anything the dashboard needs for a
+# sidebar selection is a roll-up over the selected cells, and new rows are
+# folded in with append() without touching the old ones.
+
+CUBE_DIMS = ['Age', 'Gender', 'Category', 'Occupation']
+FILTER_DIMS = ['Age', 'Gender', 'Category']
+CORR_FEATURES = ['Age_Code', 'Gender_Code', 'Occupation', 'Marital_Status', 'Purchase']
+
+
+def dim_codes(s):
+    # (codes, labels) for a categorical or small-integer column
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), list(s.cat.categories)
+    labels, codes = np.unique(s.to_numpy(), return_inverse=True)
+    return codes, labels.tolist()
+
+
+class _Cells:
+    # dense grid over `dims`; unseen labels on append grow the grid
+    arrays = ()
+
+    def __init__(self, dims):
+        self.dims = list(dims)
+        self.labels = {d: [] for d in self.dims}
+        self._pos = {d: {} for d in self.dims}
+
+    @property
+    def shape(self):
+        return tuple(len(self.labels[d]) for d in self.dims)
+
+    def _flat(self, df):
+        old_shape = self.shape
+        codes = []
+        for dim in self.dims:
+            c, labels = dim_codes(df[dim])
+            pos = self._pos[dim]
+            for v in labels:
+                if v not in pos:
+                    pos[v] = len(self.labels[dim])
+                    self.labels[dim].append(v)
+            codes.append(np.asarray([pos[v] for v in labels], dtype=np.intp)[c])
+        if self.shape != old_shape:
+            self._grow(old_shape)
+        return np.ravel_multi_index(codes, self.shape)
+
+    def _grow(self, old_shape):
+        for name in self.arrays:
+            a = getattr(self, name)
+            pad = [(0, new - old) for new, old in zip(self.shape, old_shape)]
+            pad += [(0, 0)] * (a.ndim - len(old_shape))
+            setattr(self, name, np.pad(a, pad))
+
+    def _slicer(self, selection):
+        idx = []
+        for dim in self.dims:
+            labels = self.labels[dim]
+            if selection and dim in selection:
+                chosen = set(selection[dim])
+                idx.append([i for i, v in enumerate(labels) if v in chosen])
+            else:
+                idx.append(list(range(len(labels))))
+        return np.ix_(*idx), idx
+
+    def _bincount(self, flat, weights=None):
+        size = int(np.prod(self.shape))
+        return np.bincount(flat, weights=weights, minlength=size).reshape(self.shape)
+
+
+class Cube(_Cells):
+    # count / sum / sum-of-squares of one measure per cell
+    arrays = ('count', 'sum', 'sumsq')
+
+    def __init__(self, df, dims=CUBE_DIMS, measure='Purchase'):
+        super().__init__(dims)
+        self.measure = measure
+        self.count = np.zeros(self.shape, dtype=np.int64)
+        self.sum = np.zeros(self.shape)
+        self.sumsq = np.zeros(self.shape)
+        self.append(df)
+
+    def append(self, df):
+        if not len(df):
+            return self
+        flat = self._flat(df)
+        x = df[self.measure].to_numpy(dtype="float64")
+        self.count += self._bincount(flat)
+        self.sum += self._bincount(flat, x)
+        self.sumsq += self._bincount(flat, x * x)
+        return self
+
+    @classmethod
+    def from_groups(cls, groups, dims=CUBE_DIMS, measure='Purchase'):
+        # from pre-aggregated rows (dims + count / sum / sumsq), e.g. a GROUP BY
+        return cls(groups.head(0), dims, measure).add_groups(groups)
+
+    def add_groups(self, groups):
+        if not len(groups):
+            return self
+        flat = self._flat(groups)
+        self.count += np.rint(self._bincount(flat, groups['count'].to_numpy(dtype="float64"))).astype(np.int64)
+        self.sum += self._bincount(flat, groups['sum'].to_numpy(dtype="float64"))
+        self.sumsq += self._bincount(flat, groups['sumsq'].to_numpy(dtype="float64"))
+        return self
+
+    def rollup(self, by=(), selection=None):
+        # aggregate the selected cells down to the `by` dimensions
+        by = [by] if isinstance(by, str) else list(by)
+        ix, idx = self._slicer(selection)
+        axes = tuple(i for i, d in enumerate(self.dims) if d not in by)
+        keep = [d for d in self.dims if d in by]
+        count = self.count[ix].sum(axis=axes)
+        total = self.sum[ix].sum(axis=axes)
+        sumsq = self.sumsq[ix].sum(axis=axes)
+
+        if not keep:
+            return pd.DataFrame({"count": [count], "sum": [total], "sumsq": [sumsq]}).pipe(_finish)
+
+        grid = np.meshgrid(*[np.asarray(self.labels[d], dtype=object)[idx[self.dims.index(d)]] for d in keep],
+                           indexing="ij")
+        out = pd.DataFrame({d: g.ravel() for d, g in zip(keep, grid)})
+        out["count"] = count.ravel()
+        out["sum"] = total.ravel()
+        out["sumsq"] = sumsq.ravel()
+        out = _finish(out[out["count"] > 0].reset_index(drop=True))
+        # reorder to the requested `by` order
+        return out[list(by) + ["count", "sum", "sumsq", "mean", "std"]]
+
+    def totals(self, selection=None):
+        row = self.rollup((), selection).iloc[0]
+        return {"count": int(row["count"]), "sum": row["sum"], "mean": row["mean"], "std": row["std"]}
+
+
+class CoMoments(_Cells):
+    # n, feature sums and cross-products per filter cell; any selection's
+    # correlation matrix is a merge of its cells, O(cells x features^2)
+    arrays = ('n', 's', 'xx')
+
+    def __init__(self, df, features=CORR_FEATURES, dims=FILTER_DIMS):
+        super().__init__(dims)
+        self.features = [f for f in features if f in df.columns]
+        k = len(self.features)
+        # shift by the initial means so the cross-products stay well conditioned
+        self.shift = df[self.features].mean().to_numpy(dtype="float64") if len(df) else np.zeros(k)
+        self.n = np.zeros(self.shape, dtype=np.int64)
+        self.s = np.zeros(self.shape + (k,))
+        self.xx = np.zeros(self.shape + (k, k))
+        self.append(df)
+
+    def append(self, df):
+        if not len(df):
+            return self
+        flat = self._flat(df)
+        X = df[self.features].to_numpy(dtype="float64") - self.shift
+        k = len(self.features)
+        self.n += self._bincount(flat)
+        for i in range(k):
+            self.s[..., i] += self._bincount(flat, X[:, i])
+            for j in range(i, k):
+                cell = self._bincount(flat, X[:, i] * X[:, j])
+                self.xx[..., i, j] += cell
+                if j != i:
+                    self.xx[..., j, i] += cell
+        return self
+
+    @classmethod
+    def from_groups(cls, groups, features, shift, dims=FILTER_DIMS):
+        # from pre-aggregated rows: dims, n, s_<i> = sum(x_i - shift_i) and
+        # xx_<i>_<j> = sum of the shifted products for i <= j
+        out = cls(pd.DataFrame({f: [] for f in features}), features, dims)
+        out.shift = np.asarray(shift, dtype="float64")
+        return out.add_groups(groups)
+
+    def add_groups(self, groups):
+        if not len(groups):
+            return self
+        flat = self._flat(groups)
+        k = len(self.features)
+        self.n += np.rint(self._bincount(flat, groups['n'].to_numpy(dtype="float64"))).astype(np.int64)
+        for i in range(k):
+            self.s[..., i] += self._bincount(flat, groups[f's_{i}'].to_numpy(dtype="float64"))
+            for j in range(i, k):
+                cell = self._bincount(flat, groups[f'xx_{i}_{j}'].to_numpy(dtype="float64"))
+                self.xx[..., i, j] += cell
+                if j != i:
+                    self.xx[..., j, i] += cell
+        return self
+
+    def corr(self, selection=None):
+        ix, _ = self._slicer(selection)
+        cells = tuple(range(len(self.dims)))
+        n = self.n[ix].sum()
+        s = self.s[ix].sum(axis=cells)
+        xx = self.xx[ix].sum(axis=cells)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = (xx - np.outer(s, s) / n) / (n - 1)
+            # a column constant within the selection has zero variance up to
+            # rounding in the merged sums; report it as undefined, as pandas does
+            var = np.diag(cov)
+            sd = np.sqrt(np.where(var > 1e-12 * np.diag(xx) / (n - 1), var, np.nan))
+            corr = cov / np.outer(sd, sd)
+        corr = np.clip(corr, -1, 1)
+        return pd.DataFrame(corr, index=self.features, columns=self.features)
+
+
+def _finish(out):
+    n = out["count"].astype("float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["mean"] = out["sum"] / n
+        var = (out["sumsq"] - n * out["mean"] ** 2) / (n - 1)
+    out["std"] = np.sqrt(var.clip(lower=0))
+    return out
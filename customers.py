@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from data import AGE_CODES
+
+# ------------------ PER-CUSTOMER FEATURES ------------------
+# Per-User_ID sums kept by bincount over a user code per transaction: count,
+# spend, and counts per category / age group / gender. The feature table is
+# derived from the sums, so appending transactions only adds to them, and a
+# filter selection is one bincount over the selected rows' user codes.
+
+SEGMENT_FEATURES = ('Age_Code', 'Total_Spend', 'Transactions')
+COUNTED = ('Category', 'Age', 'Gender')
+
+
+def _codes(s, labels):
+    # codes of `s` in the running `labels` list, extended with unseen labels
+    # (in category order, as the live frame extends its categories)
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        c, uniques = s.cat.codes.to_numpy(), list(s.cat.categories)
+    else:
+        c, uniques = pd.factorize(s)
+    pos = {v: i for i, v in enumerate(labels)}
+    for v in uniques:
+        if v not in pos:
+            pos[v] = len(labels)
+            labels.append(v)
+    return np.asarray([pos[v] for v in uniques], dtype=np.intp)[c]
+
+
+class CustomerFeatures:
+
+    def __init__(self, df):
+        self._index = pd.Index([], dtype="int64")
+        self.codes = np.zeros(0, dtype=np.int32)
+        # label lists start in category order so codes match the frame's
+        self.labels = {col: list(df[col].cat.categories) if isinstance(df[col].dtype, pd.CategoricalDtype) else []
+                       for col in COUNTED}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.spend = np.zeros(0)
+        self.counts = {col: np.zeros((0, len(self.labels[col])), dtype=np.int64) for col in COUNTED}
+        self.append(df)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _user_codes(self, ids):
+        ids = np.asarray(ids, dtype="int64")
+        codes = self._index.get_indexer(ids)
+        new = codes < 0
+        if new.any():
+            fresh = pd.unique(ids[new])
+            self._index = self._index.append(pd.Index(fresh))
+            codes[new] = self._index.get_indexer(ids[new])
+        return codes.astype(np.int32)
+
+    def _sums(self, codes, cols, purchase):
+        n = len(self._index)
+        out = {"count": np.bincount(codes, minlength=n), "spend": np.bincount(codes, weights=purchase, minlength=n)}
+        for col, c in cols.items():
+            m = len(self.labels[col])
+            out[col] = np.bincount(codes.astype(np.int64) * m + c, minlength=n * m).reshape(n, m)
+        return out
+
+    def append(self, df):
+        codes = self._user_codes(df['User_ID'].to_numpy())
+        cols = {col: _codes(df[col], self.labels[col]) for col in COUNTED}
+        sums = self._sums(codes, cols, df['Purchase'].to_numpy(dtype="float64"))
+
+        n = len(self._index)
+        self.count = np.pad(self.count, (0, n - len(self.count))) + sums["count"]
+        self.spend = np.pad(self.spend, (0, n - len(self.spend))) + sums["spend"]
+        for col in COUNTED:
+            old = self.counts[col]
+            old = np.pad(old, ((0, n - old.shape[0]), (0, len(self.labels[col]) - old.shape[1])))
+            self.counts[col] = old + sums[col]
+        self.codes = np.concatenate([self.codes, codes])
+        return self
+
+    def table(self, df=None, rows=None):
+        # one row per customer with at least one (selected) transaction
+        if rows is None:
+            sums = {"count": self.count, "spend": self.spend, **self.counts}
+        else:
+            cols = {col: df[col].cat.codes.to_numpy()[rows] for col in COUNTED}
+            sums = self._sums(self.codes[rows], cols, df['Purchase'].to_numpy(dtype="float64")[rows])
+        keep = np.flatnonzero(sums["count"])
+        return feature_table(self._index.to_numpy()[keep], sums["count"][keep], sums["spend"][keep],
+                             {col: sums[col][keep] for col in COUNTED}, self.labels)
+
+
+def feature_table(ids, count, spend, counts, labels):
+    # counts: {column: users x labels}; a customer's age group / gender is the
+    # one on most of their rows
+    age = counts["Age"].argmax(axis=1) if len(ids) else np.zeros(0, dtype=np.intp)
+    gender = counts["Gender"].argmax(axis=1) if len(ids) else np.zeros(0, dtype=np.intp)
+    out = pd.DataFrame({
+        "User_ID": ids,
+        "Transactions": count,
+        "Total_Spend": spend,
+        "Avg_Spend": spend / count,
+        "Age": pd.Categorical.from_codes(age, labels["Age"], ordered=True),
+        "Gender": pd.Categorical.from_codes(gender, labels["Gender"]),
+        # the same encoding as the frame's Age_Code / Gender_Code columns
+        "Age_Code": np.asarray([AGE_CODES.get(a, len(AGE_CODES)) for a in labels["Age"]], dtype=np.int8)[age],
+        "Gender_Code": np.asarray([g == "Male" for g in labels["Gender"]], dtype=np.int8)[gender],
+    })
+    shares = counts["Category"] / count[:, None]
+    for i, cat in enumerate(labels["Category"]):
+        out[f"Share_{cat}"] = shares[:, i]
+    return out
+
+
+def feature_matrix(table, features=SEGMENT_FEATURES):
+    # z-scored so spend (thousands) does not drown out the codes
+    X = table[list(features)].to_numpy(dtype="float64")
+    std = X.std(axis=0)
+    return (X - X.mean(axis=0)) / np.where(std > 0, std, 1.0)
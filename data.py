@@ -0,0 +1,365 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from synth import SYNTH_ROWS, synthetic_cache_path, write_cache
+
+# ------------------ CONFIG ------------------
+# Point BF_DATA at the Black Friday export (CSV or Parquet). Without it the
+# dashboard runs on synthetic transactions, BF_ROWS of them.
+DATA_PATH = os.environ.get("BF_DATA")
+DEMO_ROWS = int(os.environ.get("BF_ROWS", SYNTH_ROWS))
+CACHE_DIR = os.environ.get("BF_CACHE_DIR", ".bf_cache")
+# "duckdb" queries the Parquet cache instead of loading it (needs duckdb)
+BACKEND = os.environ.get("BF_BACKEND", "pandas")
+CHUNK_ROWS = 250_000
+# bump when the derived columns change so stale caches are rebuilt
+CACHE_VERSION = 2
+
+# ------------------ SCHEMA ------------------
+AGE_CODES = {'0-17': 0, '18-25': 1, '26-35': 2, '36-45': 3, '46-50': 4, '51-55': 5, '55+': 6}
+GENDER_NAMES = {'M': 'Male', 'F': 'Female'}
+DERIVED_COLUMNS = ['Age_Code', 'Gender_Code', 'Scaled']
+
+# dtypes for the columns of the raw export; anything else is read as-is
+CSV_DTYPES = {
+    "User_ID": "int64",
+    "Product_ID": "string",
+    "Gender": "string",
+    "Age": "string",
+    "Occupation": "int64",
+    "City_Category": "string",
+    "Stay_In_Current_City_Years": "string",
+    "Marital_Status": "int64",
+    "Product_Category_1": "int64",
+    "Product_Category_2": "float64",
+    "Product_Category_3": "float64",
+    "Purchase": "float64",
+}
+
+
+# ------------------ RUNNING MOMENTS ------------------
+# (n, mean, M2) triples, merged with Chan's parallel update so the scaling
+# statistics can be accumulated chunk by chunk.
+
+def moments(x):
+    x = np.asarray(x, dtype="float64")
+    if len(x) == 0:
+        return (0, 0.0, 0.0)
+    mean = float(x.mean())
+    return (len(x), mean, float(((x - mean) ** 2).sum()))
+
+
+def merge_moments(a, b):
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return (0, 0.0, 0.0)
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / n
+    return (n, mean, m2)
+
+
+def scale_params(m):
+    # same convention as StandardScaler: population std, 1.0 for constant columns
+    n, mean, m2 = m
+    std = np.sqrt(m2 / n) if n else 0.0
+    return mean, (std if std > 0 else 1.0)
+
+
+# ------------------ NORMALIZATION ------------------
+
+def normalize(df):
+    # map the raw export onto the column names used throughout the app
+    df = df.copy()
+    if "Gender" in df.columns:
+        df["Gender"] = df["Gender"].replace(GENDER_NAMES)
+    if "Category" not in df.columns and "Product_Category_1" in df.columns:
+        df["Category"] = "Cat " + df["Product_Category_1"].astype(str)
+    df["Purchase"] = df["Purchase"].astype("float64")
+    df["Age_Code"] = df["Age"].map(AGE_CODES).astype("int64")
+    df["Gender_Code"] = (df["Gender"] == "Male").astype("int64")
+    return df
+
+
+# ------------------ RAW EXPORT -> PARQUET INGESTION ------------------
+
+def fingerprint(path):
+    st_ = os.stat(path)
+    key = f"{os.path.abspath(path)}:{st_.st_size}:{st_.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def cache_path(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{stem}-{fingerprint(path)}-v{CACHE_VERSION}.parquet")
+
+
+def ingest_chunks(chunks, out_path, chunk_rows=CHUNK_ROWS):
+    # stream normalized chunks into a compact Parquet cache in two passes,
+    # never holding more than one chunk in memory
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".part"
+
+    # pass 1: normalize each chunk, accumulate Purchase moments and the
+    # dtype plan (category sets, integer ranges) across all chunks
+    writer = None
+    m = (0, 0.0, 0.0)
+    plan = {}
+    try:
+        for chunk in chunks:
+            chunk = normalize(chunk)
+            m = merge_moments(m, moments(chunk["Purchase"]))
+            plan = dtype_plan(chunk, plan)
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # pass 2: columnar re-read (no CSV re-parse), add Scaled from the global
+    # moments and write the compact dtypes so the cache loads as categoricals
+    mean, std = scale_params(m)
+    plan["Scaled"] = ("float", True)
+    writer = None
+    try:
+        for batch in pq.ParquetFile(tmp_path, memory_map=True).iter_batches(batch_size=chunk_rows):
+            part = batch.to_pandas()
+            part["Scaled"] = (part["Purchase"] - mean) / std
+            table = pa.Table.from_pandas(apply_plan(part, plan), preserve_index=False)
+            if writer is None:
+                meta = dict(table.schema.metadata or {})
+                meta[b"bf_moments"] = json.dumps(m).encode()
+                schema = table.schema.with_metadata(meta)
+                writer = pq.ParquetWriter(out_path, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.remove(tmp_path)
+    return out_path
+
+
+def ingest_csv(path, out_path, chunk_rows=CHUNK_ROWS):
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {c: t for c, t in CSV_DTYPES.items() if c in header}
+    chunks = pd.read_csv(path, chunksize=chunk_rows, dtype=dtypes)
+    return ingest_chunks(chunks, out_path, chunk_rows)
+
+
+def ingest_parquet(path, out_path, chunk_rows=CHUNK_ROWS):
+    # a raw Parquet export goes through the same normalize / compact passes
+    batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunk_rows)
+    return ingest_chunks((b.to_pandas() for b in batches), out_path, chunk_rows)
+
+
+def normalized(path):
+    # a Parquet file that already has the derived columns (a cache, or a copy of one)
+    names = pq.read_schema(path).names
+    return all(c in names for c in DERIVED_COLUMNS)
+
+
+# ------------------ COMPACT DTYPES ------------------
+# strings -> pandas.Categorical (Age keeps its natural band order),
+# integers -> narrowest width, floats -> float32 when lossless. The plan is
+# folded chunk by chunk so streamed chunks all get the same dtypes.
+
+def _age_order(values):
+    return sorted(values, key=lambda a: AGE_CODES.get(a, len(AGE_CODES)))
+
+
+def _smallest_int(lo, hi):
+    for t in ("int8", "int16", "int32"):
+        info = np.iinfo(t)
+        if lo >= info.min and hi <= info.max:
+            return t
+    return "int64"
+
+
+def dtype_plan(df, plan=None):
+    plan = dict(plan or {})
+    for col in df.columns:
+        s = df[col]
+        prev = plan.get(col)
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            values = set(s.cat.categories)
+            plan[col] = ("category", values | prev[1] if prev else values)
+        elif pd.api.types.is_string_dtype(s) or s.dtype == object:
+            values = set(s.dropna().unique())
+            plan[col] = ("category", values | prev[1] if prev else values)
+        elif pd.api.types.is_integer_dtype(s) and len(s):
+            lo, hi = int(s.min()), int(s.max())
+            plan[col] = ("int", min(lo, prev[1]), max(hi, prev[2])) if prev else ("int", lo, hi)
+        elif pd.api.types.is_float_dtype(s):
+            # Scaled is a derived feature, float32 precision is plenty for it
+            lossless = col == "Scaled" or np.array_equal(s.astype("float32").astype("float64"), s, equal_nan=True)
+            plan[col] = ("float", lossless and (prev[1] if prev else True))
+    return plan
+
+
+def apply_plan(df, plan):
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        kind = plan.get(col, (None,))
+        if kind[0] == "category":
+            cats = _age_order(kind[1]) if col == "Age" else sorted(kind[1])
+            if isinstance(s.dtype, pd.CategoricalDtype) and list(s.cat.categories) == cats:
+                out[col] = s
+            else:
+                out[col] = pd.Categorical(s, categories=cats, ordered=col == "Age")
+        elif kind[0] == "int":
+            out[col] = s.astype(_smallest_int(kind[1], kind[2]))
+        elif kind[0] == "float":
+            out[col] = s.astype("float32") if kind[1] else s
+        else:
+            out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def compact(df):
+    return apply_plan(df, dtype_plan(df))
+
+
+def freeze(df):
+    # one private, read-only copy of every column buffer: the frame can be
+    # shared by all sessions, and an accidental in-place write raises instead
+    # of leaking into other users' views
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes = s.cat.codes.to_numpy().copy()
+            codes.flags.writeable = False
+            out[col] = pd.Categorical.from_codes(codes, dtype=s.dtype)
+        else:
+            values = s.to_numpy().copy()
+            values.flags.writeable = False
+            out[col] = values
+    return pd.DataFrame(out, index=df.index, copy=False)
+
+
+def append_frame(base, new, m):
+    # base's rows followed by new's, in base's columns and dtypes (categories
+    # extended, ints widened only if the new values need it). Scaled is
+    # recomputed for all rows from the merged Purchase moments `m`.
+    missing = [c for c in base.columns if c not in new.columns]
+    if missing:
+        raise ValueError(f"Appended rows lack columns: {missing}")
+    out = {}
+    for col in base.columns:
+        a, b = base[col], new[col]
+        if isinstance(a.dtype, pd.CategoricalDtype):
+            cats = list(a.cat.categories)
+            extra = b.cat.categories if isinstance(b.dtype, pd.CategoricalDtype) else pd.unique(b.astype(object))
+            cats += [v for v in extra if v not in set(cats)]
+            codes = np.concatenate([a.cat.codes.to_numpy(), pd.Categorical(b, categories=cats).codes])
+            out[col] = pd.Categorical.from_codes(codes, categories=cats, ordered=a.cat.ordered)
+        elif col == "Scaled":
+            continue
+        else:
+            dtype = a.dtype
+            if pd.api.types.is_integer_dtype(dtype) and len(b):
+                dtype = np.promote_types(dtype, _smallest_int(int(b.min()), int(b.max())))
+            out[col] = np.concatenate([a.to_numpy(dtype=dtype), b.to_numpy(dtype=dtype)])
+    out = pd.DataFrame(out, index=pd.RangeIndex(len(base) + len(new)))
+    if "Scaled" in base.columns:
+        mean, std = scale_params(m)
+        out["Scaled"] = ((out["Purchase"].to_numpy(dtype="float64") - mean) / std).astype(base["Scaled"].dtype)
+    return out[list(base.columns)]
+
+
+def _naive_dtype(s):
+    if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(s):
+        return object
+    if pd.api.types.is_integer_dtype(s):
+        return "int64"
+    if pd.api.types.is_float_dtype(s):
+        return "float64"
+    return s.dtype
+
+
+def memory_report(df):
+    # bytes per column for the compact frame vs. the object/int64/float64 layout
+    rows = []
+    for col in df.columns:
+        s = df[col]
+        naive = s.astype(_naive_dtype(s))
+        rows.append({
+            "Column": col,
+            "Before dtype": str(naive.dtype),
+            "Before (bytes)": int(naive.memory_usage(index=False, deep=True)),
+            "After dtype": str(s.dtype),
+            "After (bytes)": int(s.memory_usage(index=False, deep=True)),
+        })
+    report = pd.DataFrame(rows)
+    total = report[["Before (bytes)", "After (bytes)"]].sum()
+    report.loc[len(report)] = ["Total", "", total.iloc[0], "", total.iloc[1]]
+    return report
+
+
+def read_cache(path):
+    table = pq.read_table(path, memory_map=True)
+    return table.to_pandas()
+
+
+# ------------------ LOADERS ------------------
+
+def load_csv(path):
+    return read_cache(parquet_file(path))
+
+
+def load_parquet(path):
+    return read_cache(parquet_file(path))
+
+
+def load_synthetic(n_rows=DEMO_ROWS):
+    return read_cache(parquet_file(None, n_rows))
+
+
+def source_file(path=None):
+    # the file a frame is actually read from (the generated cache for the demo)
+    return path or synthetic_cache_path(DEMO_ROWS)
+
+
+def parquet_file(path=None, n_rows=DEMO_ROWS):
+    # the Parquet file behind a source, written (streamed, chunk by chunk)
+    # if it does not exist yet but never read here. Raw exports, CSV or
+    # Parquet, are ingested into a versioned cache both backends read
+    if not path:
+        out = synthetic_cache_path(n_rows)
+        if not os.path.exists(out):
+            workers = os.cpu_count() if n_rows > 4 * CHUNK_ROWS else 1
+            write_cache(n_rows, workers=workers, out_path=out)
+        return out
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet" and normalized(path):
+        return path
+    out = cache_path(path)
+    if not os.path.exists(out):
+        (ingest_csv if ext == ".csv" else ingest_parquet)(path, out)
+    return out
+
+
+LOADERS = {
+    ".csv": load_csv,
+    ".parquet": load_parquet,
+}
+
+
+def load_frame(path=None):
+    if not path:
+        return compact(load_synthetic())
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in LOADERS:
+        raise ValueError(f"Unsupported data file: {path}")
+    return compact(LOADERS[ext](path))
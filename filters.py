@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ------------------ SIDEBAR FILTER INDEX ------------------
+# One packed bitmap (1 bit per row) per value of each filter column, built
+# once per load. A sidebar selection is the OR of the chosen values' bitmaps
+# within a column, ANDed across columns.
+
+FILTER_COLUMNS = ['Age', 'Gender', 'Category']
+
+
+def selection_key(values, selection, columns=FILTER_COLUMNS):
+    # order-insensitive: the same values picked in any order share a key.
+    # values: {column: labels in category order}
+    out = []
+    for col in columns:
+        chosen = set(selection.get(col, values[col]))
+        out.append((col, tuple(v for v in values[col] if v in chosen)))
+    return tuple(out)
+
+
+class BitmapIndex:
+
+    def __init__(self, df, columns=FILTER_COLUMNS, cache_size=16):
+        self.n = len(df)
+        self.columns = list(columns)
+        self.values = {}
+        self.bitmaps = {}
+        for col in self.columns:
+            codes = df[col].cat.codes.to_numpy()
+            cats = list(df[col].cat.categories)
+            self.values[col] = cats
+            self.bitmaps[col] = {v: np.packbits(codes == i) for i, v in enumerate(cats)}
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def extend(self, df):
+        # a new index over these rows followed by df's; the existing bitmaps
+        # are reused and only the new rows are encoded
+        out = BitmapIndex.__new__(BitmapIndex)
+        out.n = self.n + len(df)
+        out.columns = self.columns
+        out.values = {}
+        out.bitmaps = {}
+        rem = self.n % 8
+        for col in self.columns:
+            cats = list(self.values[col])
+            cats += [v for v in df[col].cat.categories if v not in cats]
+            codes = pd.Categorical(df[col], categories=cats).codes
+            out.values[col] = cats
+            out.bitmaps[col] = {}
+            for i, v in enumerate(cats):
+                old = self.bitmaps[col].get(v, np.zeros((self.n + 7) // 8, dtype=np.uint8))
+                mask = codes == i
+                if rem:
+                    # finish the partially filled last byte first
+                    head = np.unpackbits(old[-1:])[:rem]
+                    out.bitmaps[col][v] = np.concatenate([old[:-1], np.packbits(np.concatenate([head, mask]))])
+                else:
+                    out.bitmaps[col][v] = np.concatenate([old, np.packbits(mask)])
+        out.cache_size = self.cache_size
+        out._cache = OrderedDict()
+        out._lock = threading.Lock()
+        out.hits = 0
+        out.misses = 0
+        return out
+
+    def key(self, selection):
+        return selection_key(self.values, selection, self.columns)
+
+    def is_full(self, key):
+        return all(len(vals) == len(self.values[col]) for col, vals in key)
+
+    def bits(self, key):
+        out = None
+        for col, vals in key:
+            if len(vals) == len(self.values[col]):
+                continue
+            col_bits = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+            for v in vals:
+                col_bits |= self.bitmaps[col][v]
+            out = col_bits if out is None else (out & col_bits)
+        if out is None:
+            out = np.packbits(np.ones(self.n, dtype=bool))
+        return out
+
+    def rows(self, selection):
+        # row positions for a {column: [values]} selection, LRU-cached
+        key = self.key(selection)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.misses += 1
+
+        if self.is_full(key):
+            rows = np.arange(self.n)
+        else:
+            mask = np.unpackbits(self.bits(key), count=self.n).view(bool)
+            rows = np.flatnonzero(mask)
+        rows.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = rows
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
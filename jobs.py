@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+# ------------------ BACKGROUND JOBS ------------------
+# Long computations run in a pool of worker processes instead of inside the
+# Streamlit script. A job is a list of independent tasks (one per k for the
+# elbow sweep), so progress is the share of finished tasks and cancelling a
+# job drops the tasks that have not started yet. Jobs are keyed on their
+# parameters: sessions asking for the same key share one job, and an owner
+# (session + page slot) that asks for a new key releases its old job, which
+# is cancelled once no other session is waiting on it. A worker that dies
+# (killed, out of memory) breaks the pool; the next job starts a fresh one.
+
+JOB_WORKERS = int(os.environ.get("BF_JOB_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# how long a rerun waits for a new job before showing progress instead
+JOB_WAIT_S = float(os.environ.get("BF_JOB_WAIT", 0.5))
+FINISHED = 64
+
+
+class Job:
+
+    def __init__(self, key, futures, combine, on_done=None, on_finish=None):
+        self.key = key
+        self.futures = futures
+        self.combine = combine
+        self.on_done = on_done
+        self.on_finish = on_finish
+        self.owners = set()
+        self.started = time.time()
+        self.value = None
+        self.error = None
+        self.finished = threading.Event()
+        self._left = len(futures)
+        self._lock = threading.Lock()
+
+    def start(self):
+        for f in self.futures:
+            f.add_done_callback(self._task_done)
+
+    @classmethod
+    def completed(cls, key, value):
+        job = cls(key, [], None)
+        job.value = value
+        job.finished.set()
+        return job
+
+    @property
+    def done(self):
+        return self.finished.is_set()
+
+    @property
+    def progress(self):
+        if not self.futures:
+            return 1.0
+        return sum(f.done() for f in self.futures) / len(self.futures)
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    def _task_done(self, future):
+        with self._lock:
+            self._left -= 1
+            if self._left:
+                return
+        try:
+            self.value = self.combine([f.result() for f in self.futures])
+            if self.on_done:
+                self.on_done(self.value)
+        except CancelledError:
+            pass
+        except Exception as exc:
+            self.error = exc
+        self.finished.set()
+        if self.on_finish:
+            self.on_finish(self)
+
+    def cancel(self):
+        for f in self.futures:
+            f.cancel()
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+@contextmanager
+def _plain_main():
+    # a spawned worker re-imports the parent's __main__, which under Streamlit
+    # is the app script; workers are started inside submit(), so hide it there
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+class JobRunner:
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self._pool = self._new_pool()
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._owners = {}
+        # re-entrant: a future that is already done (or cancelled under the
+        # lock) runs its callbacks, and so _retire, in the calling thread
+        self._lock = threading.RLock()
+
+    def _new_pool(self):
+        # spawned, not forked: the Streamlit server process is multi-threaded
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _start(self, tasks):
+        with _plain_main():
+            try:
+                return [self._pool.submit(fn, *args) for fn, args in tasks]
+            except BrokenProcessPool:
+                # its jobs have already failed with the same error
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+                return [self._pool.submit(fn, *args) for fn, args in tasks]
+
+    def submit(self, owner, key, tasks, combine=list, on_done=None):
+        # tasks: () -> [(fn, args)], called only when a new job is started;
+        # returns the job now serving `owner`
+        with self._lock:
+            self._release(owner, key)
+            if key in self._finished:
+                self._finished.move_to_end(key)
+                return self._finished[key]
+            job = self._jobs.get(key)
+            if job is None:
+                futures = self._start(tasks())
+                job = self._jobs[key] = Job(key, futures, combine, on_done, self._retire)
+                job.start()
+            job.owners.add(owner)
+            self._owners[owner] = key
+            return job
+
+    def lookup(self, key):
+        with self._lock:
+            return self._finished.get(key)
+
+    def remember(self, key, value):
+        # a result found elsewhere (e.g. the disk store) served like a finished job
+        job = Job.completed(key, value)
+        with self._lock:
+            self._finished[key] = job
+            self._trim()
+        return job
+
+    def _release(self, owner, key):
+        old = self._owners.get(owner)
+        if old is None or old == key:
+            return
+        job = self._jobs.get(old)
+        if job is not None:
+            job.owners.discard(owner)
+            if not job.owners and not job.done:
+                # superseded and nobody else is waiting for it
+                job.cancel()
+                del self._jobs[old]
+
+    def _retire(self, job):
+        with self._lock:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+            if job.error is None and job.value is not None:
+                self._finished[job.key] = job
+                self._trim()
+
+    def _trim(self):
+        while len(self._finished) > FINISHED:
+            self._finished.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"running": len(self._jobs), "finished": len(self._finished)}
+
+
+# ------------------ WORKER TASKS ------------------
+# Run in the pool processes on the feature matrix the caller already built
+# (one row per customer, a few columns), so a worker never loads the dataset
+# and appends cost it nothing.
+
+def elbow_task(X, mode, k, scale=1.0):
+    from clustering import elbow_curve
+
+    # scale: WCSS of a customer sample reported on the whole table's scale
+    ks, wcss = elbow_curve(X, k_range=[k], mode=mode, n_jobs=1)
+    return [(k, w * scale) for k, w in zip(ks, wcss)]
+
+
+def combine_elbow(parts):
+    pairs = sorted(p for part in parts for p in part)
+    return [k for k, _ in pairs], [w for _, w in pairs]
@@ -0,0 +1,251 @@
+import argparse
+import copy
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import store
+from data import DATA_PATH, LOADERS, append_frame, fingerprint, freeze, load_frame, merge_moments, moments, source_file
+
+# ------------------ LIVE DATASET ------------------
+# The loaded frame plus everything derived from it, kept current as new
+# transaction files arrive. Appending ingests only the new file, merges its
+# Purchase moments into the running ones (Scaled follows from those), and
+# patches each derived structure by the delta: cube / co-moment / customer
+# sums are added to, bitmaps are extended, and the sorted Purchase arrays get
+# the new values inserted by binary search. Itemset counts are cube roll-ups,
+# so they are patched with the cube.
+#
+# New files are picked up from BF_DROP_DIR (at most every BF_DROP_POLL
+# seconds). Write them under a dot-name and rename, or use
+#   python live.py hourly-1400.csv
+# On restart the files in the directory are replayed onto the base data.
+
+DROP_DIR = os.environ.get("BF_DROP_DIR")
+DROP_POLL_S = float(os.environ.get("BF_DROP_POLL", 10))
+SORTED_ENTRIES = 32
+
+
+def _index(frame):
+    from filters import BitmapIndex
+    return BitmapIndex(frame)
+
+
+def _cube(frame):
+    from cube import Cube
+    return Cube(frame)
+
+
+def _comoments(frame):
+    from cube import CoMoments
+    return CoMoments(frame)
+
+
+def _customers(frame):
+    from customers import CustomerFeatures
+    return CustomerFeatures(frame)
+
+
+def _sample(frame):
+    from approx import StratifiedSample
+    return StratifiedSample(frame)
+
+
+def _iforest(frame):
+    from anomaly import IsolationScorer
+    return IsolationScorer(frame)
+
+
+def _added(obj, new):
+    obj = copy.deepcopy(obj)
+    obj.append(new)
+    return obj
+
+
+# name -> (build from the full frame, patch with the appended rows)
+PARTS = {
+    "index": (_index, lambda index, new: index.extend(new)),
+    "cube": (_cube, _added),
+    "comoments": (_comoments, _added),
+    "customers": (_customers, _added),
+    "sample": (_sample, _added),
+    # trained once; appended rows are scored by the same model
+    "iforest": (_iforest, lambda scorer, new: scorer),
+}
+# parts also kept in the disk store (the index is cheaper to rebuild than to read)
+STORED = ("cube", "comoments", "customers", "sample", "iforest")
+
+
+def _params(name):
+    # store params of a part: the sample also depends on its size
+    if name == "sample":
+        from approx import SAMPLE_ROWS
+        return (SAMPLE_ROWS,)
+    return ()
+
+
+def version_key(source, appended):
+    # the disk store key: the source fingerprint, advanced by every append
+    if not appended:
+        return source
+    digest = hashlib.sha1(repr((source, appended)).encode()).hexdigest()[:16]
+    return (source[0], digest)
+
+
+class Dataset:
+
+    def __init__(self, path=DATA_PATH, drop_files=()):
+        self.path = path
+        self.frame = freeze(load_frame(path))
+        self.moments = moments(self.frame["Purchase"])
+        self.source = store.dataset(source_file(path))
+        self.appended = ()
+        # drop files that failed to append: path -> (fingerprint, error)
+        self.rejected = {}
+        self.version = 0
+        self._parts = {}
+        self._sorted = OrderedDict()
+        self._lock = threading.RLock()
+        self._polled = 0.0
+        for f in drop_files:
+            self.append_file(f)
+
+    @property
+    def key(self):
+        return version_key(self.source, self.appended)
+
+    @property
+    def files(self):
+        return tuple(f for f, _ in self.appended)
+
+    @property
+    def data_files(self):
+        # the source and every appended file this version was built from
+        return (source_file(self.path),) + self.files
+
+    def part(self, name):
+        with self._lock:
+            if name not in self._parts:
+                build = PARTS[name][0]
+                if name in STORED:
+                    self._parts[name] = store.cached(self.key, name, _params(name), lambda: build(self.frame))
+                else:
+                    self._parts[name] = build(self.frame)
+            return self._parts[name]
+
+    def snapshot(self):
+        # frame, index and cube of one version, for a rerun to work from
+        with self._lock:
+            return self.frame, self.part("index"), self.part("cube")
+
+    def sorted_purchases(self, sel_key):
+        from anomaly import CARRY_COLUMNS, SortedPurchases
+
+        with self._lock:
+            if sel_key in self._sorted:
+                self._sorted.move_to_end(sel_key)
+                return self._sorted[sel_key]
+            frame, index, version = self.frame, self.part("index"), self.version
+        sp = SortedPurchases(frame[['Purchase', *CARRY_COLUMNS]].take(index.rows(dict(sel_key))))
+        with self._lock:
+            if self.version == version:
+                self._sorted[sel_key] = sp
+                while len(self._sorted) > SORTED_ENTRIES:
+                    self._sorted.popitem(last=False)
+        return sp
+
+    def append(self, new, label=None):
+        # new: normalized rows, as the loaders return them; label names the
+        # file they came from
+        from anomaly import CARRY_COLUMNS
+
+        with self._lock:
+            n_old = len(self.frame)
+            m = merge_moments(self.moments, moments(new["Purchase"]))
+            frame = freeze(append_frame(self.frame, new, m))
+            new = frame.iloc[n_old:]
+
+            self.part("index")
+            parts = {name: PARTS[name][1](obj, new) for name, obj in self._parts.items()}
+            sorted_ = OrderedDict()
+            for sel_key, sp in self._sorted.items():
+                rows = parts["index"].rows(dict(sel_key))
+                added = rows[rows >= n_old]
+                sorted_[sel_key] = sp.merged(frame[['Purchase', *CARRY_COLUMNS]].take(added))
+
+            self.frame, self.moments, self._parts, self._sorted = frame, m, parts, sorted_
+            self.appended += ((label or f"rows-{self.version + 1}", fingerprint(label) if label else ""),)
+            self.version += 1
+            for name in STORED:
+                if name in parts:
+                    store.put(self.key, name, _params(name), parts[name])
+            store.invalidate(self.key, self.data_files)
+            return len(new)
+
+    def append_file(self, path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in LOADERS:
+            raise ValueError(f"Unsupported data file: {path}")
+        return self.append(LOADERS[ext](path), label=path)
+
+    def poll(self, drop_dir=DROP_DIR, every=DROP_POLL_S):
+        # append the files that appeared in drop_dir since the last look
+        if not drop_dir or time.time() - self._polled < every or not os.path.isdir(drop_dir):
+            return 0
+        with self._lock:
+            self._polled = time.time()
+            return poll_files(self, drop_dir)
+
+
+def poll_files(ds, drop_dir):
+    # append drop_dir's new files to ds (a Dataset or query backend). A file
+    # that fails is recorded in ds.rejected and skipped until it changes, so
+    # one bad file neither blocks the others nor takes the app down
+    added = 0
+    for path in new_files(drop_dir, ds.files):
+        fp = fingerprint(path)
+        if ds.rejected.get(path, (None,))[0] == fp:
+            continue
+        try:
+            added += ds.append_file(path)
+        except Exception as exc:
+            ds.rejected[path] = (fp, f"{type(exc).__name__}: {exc}")
+        else:
+            ds.rejected.pop(path, None)
+    return added
+
+
+def new_files(drop_dir, seen):
+    # data files in drop_dir not in `seen`, by name; dot-files are still being written
+    names = sorted(n for n in os.listdir(drop_dir)
+                   if not n.startswith(".") and os.path.splitext(n)[1].lower() in LOADERS)
+    seen = set(seen)
+    return [p for p in (os.path.join(drop_dir, n) for n in names) if p not in seen]
+
+
+def drop(path, drop_dir=DROP_DIR):
+    # copy under a hidden name, then rename, so a poll never reads half a file
+    if not drop_dir:
+        raise ValueError("No drop directory (set BF_DROP_DIR)")
+    os.makedirs(drop_dir, exist_ok=True)
+    name = os.path.basename(path)
+    tmp = os.path.join(drop_dir, f".{name}.{os.getpid()}")
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, os.path.join(drop_dir, name))
+    return os.path.join(drop_dir, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hand new transaction files to the running dashboard.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--drop-dir", default=DROP_DIR)
+    args = parser.parse_args()
+    for f in args.files:
+        print(drop(f, args.drop_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import cProfile
+import io
+import json
+import logging
+import logging.handlers
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from data import CACHE_DIR
+
+# ------------------ CONFIG ------------------
+# BF_PERF=1 (or ?perf=1 in the URL) shows the Performance panel,
+# BF_PERF_MEMORY=1 adds tracemalloc peaks to every span (slower reruns),
+# BF_PROM_FILE is a node_exporter textfile-collector path for p50/p95.
+PERF_DIR = os.environ.get("BF_PERF_DIR", os.path.join(CACHE_DIR, "perf"))
+PERF_PANEL = os.environ.get("BF_PERF") == "1"
+TRACE_MEMORY = os.environ.get("BF_PERF_MEMORY") == "1"
+PROM_FILE = os.environ.get("BF_PROM_FILE")
+PROM_EVERY_S = 15
+WINDOW = 1000
+
+_local = threading.local()
+
+
+# ------------------ PER-RERUN SPANS ------------------
+
+class Rerun:
+
+    def __init__(self, session, profile=False):
+        self.session = session
+        self.page = None
+        self.spans = []
+        self._section = None
+        self._stack = []
+        self.t0 = time.perf_counter()
+        self.memory = TRACE_MEMORY
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.profiler = cProfile.Profile() if profile else None
+        if self.profiler:
+            self.profiler.enable()
+
+    @contextmanager
+    def span(self, name):
+        # recorded in start order so nested spans list under their parent
+        rec = {"name": name, "depth": len(self._stack), "ms": None}
+        self.spans.append(rec)
+        # [absolute peak seen by finished children] per open span; a child
+        # resets tracemalloc's peak, so the parent folds the child's in
+        self._stack.append(0)
+        if self.memory:
+            mem0 = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            rec["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            child_peak = self._stack.pop()
+            if self.memory:
+                peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+                rec["peak_mb"] = round((peak - mem0) / 2 ** 20, 2)
+                if self._stack:
+                    self._stack[-1] = max(self._stack[-1], peak)
+
+    def section(self, name):
+        # sequential top-level spans: each section ends where the next begins
+        if self._section is not None:
+            self._section.__exit__(None, None, None)
+        self._section = self.span(name) if name else None
+        if self._section is not None:
+            self._section.__enter__()
+
+    def finish(self):
+        self.section(None)
+        self.total_ms = round((time.perf_counter() - self.t0) * 1000, 2)
+        if self.profiler:
+            self.profiler.disable()
+        return self
+
+
+def begin(session, profile=False):
+    _local.rerun = Rerun(session, profile)
+    return _local.rerun
+
+
+def current():
+    return getattr(_local, "rerun", None)
+
+
+@contextmanager
+def span(name):
+    # no-op outside an instrumented rerun (e.g. batch jobs, tests)
+    rerun = current()
+    if rerun is None:
+        yield
+        return
+    with rerun.span(name):
+        yield
+
+
+# ------------------ PROCESS-WIDE STATS ------------------
+
+class Stats:
+
+    def __init__(self, window=WINDOW):
+        self._lock = threading.Lock()
+        self.reruns = defaultdict(lambda: deque(maxlen=window))
+        # per page since start: [reruns, total seconds], for the summary's _count / _sum
+        self.totals = defaultdict(lambda: [0, 0.0])
+        self._prom_at = 0.0
+        self._log = None
+
+    def add(self, rerun):
+        with self._lock:
+            self.reruns[rerun.page].append(rerun.total_ms)
+            totals = self.totals[rerun.page]
+            totals[0] += 1
+            totals[1] += rerun.total_ms / 1000
+        self._write_log(rerun)
+        if PROM_FILE and time.time() - self._prom_at > PROM_EVERY_S:
+            self._prom_at = time.time()
+            self.write_prometheus(PROM_FILE)
+
+    def summary(self):
+        with self._lock:
+            items = {p: list(v) for p, v in self.reruns.items()}
+        return [
+            {"page": p, "reruns": len(v), "p50_ms": float(np.percentile(v, 50)), "p95_ms": float(np.percentile(v, 95))}
+            for p, v in sorted(items.items(), key=lambda kv: str(kv[0])) if v
+        ]
+
+    def _write_log(self, rerun):
+        if self._log is None:
+            with self._lock:
+                # one handler per process: the logger outlives this object
+                # (module reloads), and sessions log from their own threads
+                log = logging.getLogger("bf.perf")
+                if not log.handlers:
+                    os.makedirs(PERF_DIR, exist_ok=True)
+                    log.addHandler(logging.handlers.RotatingFileHandler(
+                        os.path.join(PERF_DIR, "reruns.log"), maxBytes=5 * 2 ** 20, backupCount=5))
+                log.propagate = False
+                log.setLevel(logging.INFO)
+                self._log = log
+        self._log.info(json.dumps({
+            "ts": round(time.time(), 3), "session": rerun.session, "page": rerun.page,
+            "total_ms": rerun.total_ms, "spans": rerun.spans,
+        }))
+
+    def write_prometheus(self, path):
+        lines = [
+            "# HELP bf_rerun_seconds Dashboard rerun latency per page.",
+            "# TYPE bf_rerun_seconds summary",
+        ]
+        with self._lock:
+            totals = {p: tuple(t) for p, t in self.totals.items()}
+        for row in self.summary():
+            page = str(row["page"]).replace('"', "'")
+            count, total = totals[row["page"]]
+            lines.append(f'bf_rerun_seconds{{page="{page}",quantile="0.5"}} {row["p50_ms"] / 1000:.6f}')
+            lines.append(f'bf_rerun_seconds{{page="{page}",quantile="0.95"}} {row["p95_ms"] / 1000:.6f}')
+            lines.append(f'bf_rerun_seconds_sum{{page="{page}"}} {total:.6f}')
+            lines.append(f'bf_rerun_seconds_count{{page="{page}"}} {count}')
+        from artifacts import ARTIFACTS
+        lines += [
+            "# HELP bf_artifact_requests_total Artifact cache lookups per artifact and result.",
+            "# TYPE bf_artifact_requests_total counter",
+        ]
+        for row in ARTIFACTS.stats():
+            name = str(row["artifact"]).replace('"', "'")
+            lines.append(f'bf_artifact_requests_total{{artifact="{name}",result="hit"}} {row["hits"]}')
+            lines.append(f'bf_artifact_requests_total{{artifact="{name}",result="miss"}} {row["misses"]}')
+        # write-then-rename so the collector never reads a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+
+STATS = Stats()
+
+
+def save_profile(rerun):
+    os.makedirs(PERF_DIR, exist_ok=True)
+    session = "".join(c for c in rerun.session if c.isalnum())[:8]
+    path = os.path.join(PERF_DIR, f"rerun-{time.strftime('%Y%m%d-%H%M%S')}-{session}.prof")
+    rerun.profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(rerun.profiler, stream=out).sort_stats("cumulative").print_stats(25)
+    return path, out.getvalue()
+
+
+# ------------------ PANEL ------------------
+
+def panel(rerun, history):
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        st.caption(f"This rerun: {rerun.total_ms:,.0f} ms on {rerun.page}")
+        spans = pd.DataFrame(rerun.spans)
+        if not spans.empty:
+            spans["name"] = ["· " * d + n for d, n in zip(spans.pop("depth"), spans["name"])]
+            st.dataframe(spans, hide_index=True, use_container_width=True)
+
+        st.caption("This session")
+        st.dataframe(pd.DataFrame(history, columns=["page", "total_ms"]).groupby("page")["total_ms"]
+                     .describe(percentiles=[0.5, 0.95])[["count", "50%", "95%"]], use_container_width=True)
+
+        st.caption("All sessions (this process)")
+        st.dataframe(pd.DataFrame(STATS.summary()), hide_index=True, use_container_width=True)
+
+        from artifacts import ARTIFACTS
+        st.caption(f"Artifact cache (all sessions): {ARTIFACTS.bytes / 2 ** 20:,.1f} of "
+                   f"{ARTIFACTS.max_bytes / 2 ** 20:,.0f} MB")
+        st.dataframe(pd.DataFrame(ARTIFACTS.stats()), hide_index=True, use_container_width=True)
+
+        if st.button("Profile next rerun (cProfile)"):
+            st.session_state["perf_profile_next"] = True
+        if "perf_profile" in st.session_state:
+            path, text = st.session_state["perf_profile"]
+            st.caption(f"Saved {path} (open with snakeviz or pstats)")
+            st.code(text[:6000])
@@ -0,0 +1,444 @@
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # optional: without it every page works from the in-memory frame
+    duckdb = None
+
+import store
+from cube import CORR_FEATURES, CUBE_DIMS, FILTER_DIMS, CoMoments, Cube
+from customers import COUNTED, feature_table
+from data import CACHE_DIR, DATA_PATH, LOADERS, _age_order, fingerprint, parquet_file
+from filters import FILTER_COLUMNS
+from live import DROP_DIR, DROP_POLL_S, poll_files, version_key
+
+# ------------------ OUT-OF-CORE QUERY BACKEND ------------------
+# With BF_BACKEND=duckdb the frame is never loaded. Pages query the Parquet
+# cache (and the caches of appended files) through DuckDB instead: sidebar
+# filters become `IN` predicates pushed into the scan, only the columns a
+# query names are read, and grouping, quantiles and sampling run inside
+# DuckDB, which spills to CACHE_DIR/duckdb past its memory limit. Only small
+# aggregates come back as pandas frames. The cube and co-moments are built
+# from one GROUP BY each and patched with a GROUP BY over each appended file.
+
+MEMORY_LIMIT = os.environ.get("BF_DUCKDB_MEMORY")  # e.g. "4GB"; DuckDB's default otherwise
+# columns the backend reads; raw exports get the derived ones in parquet_file
+REQUIRED = ['User_ID', 'Age', 'Gender', 'Category', 'Occupation', 'Purchase', 'Age_Code']
+
+
+def _quote(s):
+    return "'" + str(s).replace("'", "''") + "'"
+
+
+def _col(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ParquetQuery:
+
+    def __init__(self, path=DATA_PATH, drop_files=()):
+        if duckdb is None:
+            raise ImportError("BF_BACKEND=duckdb needs the duckdb package (pip install duckdb)")
+        config = {"temp_directory": os.path.join(CACHE_DIR, "duckdb")}
+        if MEMORY_LIMIT:
+            config["memory_limit"] = MEMORY_LIMIT
+        self._con = duckdb.connect(config=config)
+        self.path = path
+        self.parquet = [parquet_file(path)]
+        self.source = store.dataset(self.parquet[0])
+        self.appended = ()
+        self.rejected = {}
+        self.version = 0
+        self._lock = threading.RLock()
+        self._polled = 0.0
+        self._parts = {}
+        self.columns = self._columns()
+        missing = [c for c in REQUIRED if c not in self.columns]
+        if missing:
+            raise ValueError(f"{path} lacks columns {missing}")
+        self.values = self._labels()
+        for f in drop_files:
+            self.append_file(f)
+
+    @property
+    def key(self):
+        return version_key(self.source, self.appended)
+
+    @property
+    def files(self):
+        return tuple(f for f, _ in self.appended)
+
+    @property
+    def data_files(self):
+        return (self.parquet[0],) + self.files
+
+    # ---- SQL helpers ----
+
+    def _df(self, sql, params=()):
+        # a cursor per call: the connection is shared by the server's threads
+        with self._con.cursor() as cur:
+            return cur.execute(sql, list(params)).df()
+
+    def _scan(self, files=None):
+        files = self.parquet if files is None else files
+        return f"read_parquet([{', '.join(map(_quote, files))}], union_by_name = true)"
+
+    def _columns(self, files=None):
+        return list(self._df(f"DESCRIBE SELECT * FROM {self._scan(files)}")["column_name"])
+
+    def _where(self, selection):
+        # the sidebar selection as a predicate; a column with every value
+        # chosen adds none
+        values = self.values
+        terms, params = [], []
+        for col in FILTER_COLUMNS:
+            if not selection or col not in selection:
+                continue
+            chosen = set(selection[col])
+            picked = [v for v in values[col] if v in chosen]
+            if len(picked) == len(values[col]):
+                continue
+            if not picked:
+                terms.append("false")
+                continue
+            terms.append(f"{_col(col)} IN ({', '.join('?' * len(picked))})")
+            params += picked
+        return (" WHERE " + " AND ".join(terms) if terms else ""), params
+
+    def _labels(self):
+        # filter values in the order the in-memory frame's categories use
+        out = {}
+        for col in FILTER_COLUMNS:
+            values = self._df(f"SELECT DISTINCT {_col(col)} AS v FROM {self._scan()} WHERE v IS NOT NULL")["v"]
+            out[col] = _age_order(values) if col == "Age" else sorted(values)
+        return out
+
+    def _categorical(self, df):
+        for col in df.columns:
+            if col in self.values:
+                df[col] = pd.Categorical(df[col], categories=self.values[col], ordered=col == "Age")
+        return df
+
+    # ---- cube and co-moments ----
+
+    def _cube_groups(self, files=None):
+        dims = ", ".join(map(_col, CUBE_DIMS))
+        return self._categorical(self._df(
+            f'SELECT {dims}, count(*) AS "count", sum("Purchase") AS "sum", '
+            f'sum("Purchase" * "Purchase") AS "sumsq" FROM {self._scan(files)} GROUP BY ALL'))
+
+    def _comoment_groups(self, features, shift, files=None):
+        xs = [f"(CAST({_col(f)} AS DOUBLE) - {float(m)!r})" for f, m in zip(features, shift)]
+        sums = [f"sum({x}) AS s_{i}" for i, x in enumerate(xs)]
+        sums += [f"sum({xs[i]} * {xs[j]}) AS xx_{i}_{j}" for i in range(len(xs)) for j in range(i, len(xs))]
+        dims = ", ".join(map(_col, FILTER_DIMS))
+        return self._categorical(self._df(
+            f"SELECT {dims}, count(*) AS n, {', '.join(sums)} FROM {self._scan(files)} GROUP BY ALL"))
+
+    def _build(self, name):
+        if name == "cube":
+            return Cube.from_groups(self._cube_groups())
+        if name == "comoments":
+            features = [f for f in CORR_FEATURES if f in self.columns]
+            means = self._df(f"SELECT {', '.join(f'avg({_col(f)})' for f in features)} FROM {self._scan()}")
+            shift = np.nan_to_num(means.iloc[0].to_numpy(dtype="float64"))
+            return CoMoments.from_groups(self._comoment_groups(features, shift), features, shift)
+        if name == "sample":
+            return self._sample()
+        if name == "iforest":
+            from anomaly import SCORE_FEATURES, TRAIN_ROWS, IsolationScorer
+            features = [f for f in SCORE_FEATURES if f in self.columns]
+            return IsolationScorer(self.sample(None, features, TRAIN_ROWS))
+        raise KeyError(name)
+
+    def _sample(self):
+        # approx.StratifiedSample drawn in one windowed pass, with the same
+        # per-stratum quotas
+        from approx import MIN_PER_STRATUM, SAMPLE_COLUMNS, SAMPLE_ROWS, STRATA, StratifiedSample
+
+        strata = ", ".join(map(_col, STRATA))
+        cols = ", ".join(map(_col, [c for c in SAMPLE_COLUMNS if c in self.columns]))
+        sizes = self._df(f"SELECT {strata}, count(*) AS N FROM {self._scan()} GROUP BY ALL")
+        fraction = min(1.0, SAMPLE_ROWS / max(int(sizes["N"].sum()), 1))
+        rows = self._df(
+            f"SELECT {cols} FROM (SELECT {cols}, row_number() OVER (PARTITION BY {strata} ORDER BY random()) AS r, "
+            f"count(*) OVER (PARTITION BY {strata}) AS N FROM {self._scan()}) "
+            f"WHERE r <= least(N, greatest({MIN_PER_STRATUM}, round(N * ?)))", [fraction])
+        return StratifiedSample.from_rows(self._categorical(rows), sizes, fraction)
+
+    def part(self, name):
+        with self._lock:
+            if name not in self._parts:
+                self._parts[name] = self._build(name)
+            return self._parts[name]
+
+    def snapshot(self):
+        # filter values and cube of one version, for a rerun to work from
+        with self._lock:
+            return self.values, self.part("cube")
+
+    # ---- pushed-down page queries ----
+
+    def head(self, selection, n=5):
+        where, params = self._where(selection)
+        return self._categorical(self._df(f"SELECT * FROM {self._scan()}{where} LIMIT {int(n)}", params))
+
+    def box_stats(self, selection, x, y, color):
+        # charts.box_stats computed in the scan: quartiles per (x, color) and
+        # whiskers at the most extreme values inside the 1.5 IQR fences
+        where, params = self._where(selection)
+        rows = f"SELECT {_col(x)} AS x, {_col(color)} AS c, CAST({_col(y)} AS DOUBLE) AS v FROM {self._scan()}{where}"
+        inside = "v BETWEEN q1 - 1.5 * (q3 - q1) AND q3 + 1.5 * (q3 - q1)"
+        out = self._df(f"""
+            WITH r AS ({rows}),
+            q AS (SELECT x, c, quantile_cont(v, 0.25) AS q1, quantile_cont(v, 0.5) AS median,
+                         quantile_cont(v, 0.75) AS q3 FROM r GROUP BY ALL)
+            SELECT x, c, q1, median, q3, min(v) FILTER (WHERE {inside}) AS lower,
+                   max(v) FILTER (WHERE {inside}) AS upper
+            FROM r JOIN q USING (x, c) GROUP BY ALL
+        """, params).rename(columns={"x": x, "c": color})
+        return self._categorical(out).sort_values([x, color]).reset_index(drop=True)
+
+    def sample(self, selection, columns, n, seed=0):
+        # a reservoir sample of the selected rows, drawn while scanning
+        where, params = self._where(selection)
+        cols = ", ".join(map(_col, columns))
+        return self._categorical(self._df(
+            f"SELECT * FROM (SELECT {cols} FROM {self._scan()}{where}) "
+            f"USING SAMPLE reservoir({int(n)} ROWS) REPEATABLE ({int(seed)})", params))
+
+    def customer_table(self, selection):
+        # customers.feature_table from one GROUP BY over (user, age, gender,
+        # category); each customer has a handful of such groups
+        where, params = self._where(selection)
+        by = ", ".join(map(_col, ['User_ID', *COUNTED]))
+        g = self._df(f'SELECT {by}, count(*) AS n, sum("Purchase") AS spend '
+                     f'FROM {self._scan()}{where} GROUP BY ALL', params)
+        ids, user = np.unique(g["User_ID"].to_numpy(dtype="int64"), return_inverse=True)
+        n = g["n"].to_numpy(dtype="float64")
+        counts = {}
+        for col in COUNTED:
+            m = len(self.values[col])
+            codes = pd.Categorical(g[col], categories=self.values[col]).codes.astype(np.int64)
+            counts[col] = np.rint(np.bincount(user * m + codes, weights=n, minlength=len(ids) * m)) \
+                .astype(np.int64).reshape(len(ids), m)
+        count = np.rint(np.bincount(user, weights=n, minlength=len(ids))).astype(np.int64)
+        spend = np.bincount(user, weights=g["spend"].to_numpy(dtype="float64"), minlength=len(ids))
+        return feature_table(ids, count, spend, counts, self.values)
+
+    def purchases(self, selection):
+        return ScannedPurchases(self, selection)
+
+    def scores(self, selection):
+        # IsolationForest scores of the selected rows, streamed from the scan
+        # in record batches of SCORE_BATCH rows
+        from anomaly import SCORE_BATCH
+
+        scorer = self.part("iforest")
+        where, params = self._where(selection)
+        cols = ", ".join(map(_col, scorer.features))
+        with self._con.cursor() as cur:
+            reader = cur.execute(f"SELECT {cols} FROM {self._scan()}{where}", params).fetch_record_batch(SCORE_BATCH)
+            return scorer.score(batch.to_pandas().to_numpy(dtype="float64") for batch in reader)
+
+    def above(self, selection, threshold, columns):
+        # the selected rows with Purchase above threshold, largest first
+        where, params = self._where(selection)
+        where = f'{where} AND "Purchase" > ?' if where else ' WHERE "Purchase" > ?'
+        return self._categorical(self._df(
+            f'SELECT {", ".join(map(_col, columns))} FROM {self._scan()}{where} ORDER BY "Purchase" DESC',
+            [*params, float(threshold)]))
+
+    # ---- appends ----
+
+    def append_file(self, path):
+        # scan one more Parquet file (a raw export is ingested into the cache first)
+        # and patch the built parts with a GROUP BY over it alone
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in LOADERS:
+            raise ValueError(f"Unsupported data file: {path}")
+        new = parquet_file(path)
+        missing = [c for c in REQUIRED if c not in self._columns([new])]
+        if missing:
+            raise ValueError(f"{path} lacks columns {missing}")
+        with self._lock:
+            old = self.parquet, self.values
+            try:
+                self.parquet = self.parquet + [new]
+                self.values = self._labels()
+                parts = {}
+                for name, obj in self._parts.items():
+                    if name == "iforest":
+                        # trained once; it scores the new rows as they are
+                        parts[name] = obj
+                        continue
+                    obj = copy.deepcopy(obj)
+                    if name == "cube":
+                        obj.add_groups(self._cube_groups([new]))
+                    elif name == "sample":
+                        cols = ", ".join(map(_col, obj.frame.columns))
+                        obj.append(self._categorical(self._df(f"SELECT {cols} FROM {self._scan([new])}")))
+                    else:
+                        obj.add_groups(self._comoment_groups(obj.features, obj.shift, [new]))
+                    parts[name] = obj
+            except Exception:
+                # nothing of a file that fails halfway is kept
+                self.parquet, self.values = old
+                raise
+            self._parts = parts
+            self.appended += ((path, fingerprint(path)),)
+            self.version += 1
+            store.invalidate(self.key, self.data_files)
+        return int(self._df(f"SELECT count(*) AS n FROM {self._scan([new])}")["n"].iloc[0])
+
+    def poll(self, drop_dir=DROP_DIR, every=DROP_POLL_S):
+        if not drop_dir or time.time() - self._polled < every or not os.path.isdir(drop_dir):
+            return 0
+        with self._lock:
+            self._polled = time.time()
+            return poll_files(self, drop_dir)
+
+
+class ScannedPurchases:
+    # the SortedPurchases interface answered by queries over one selection:
+    # the selected values are never held, only their quartiles and range
+
+    def __init__(self, query, selection, measure='Purchase'):
+        self.query = query
+        # pinned to the files and labels of the version it was made for
+        self.scan = query._scan()
+        self.values = query.values
+        self.where, self.params = query._where(selection)
+        self.measure = f"CAST({_col(measure)} AS DOUBLE)"
+        row = query._df(f"SELECT count(*) AS n, min({self.measure}) AS lo, max({self.measure}) AS hi, "
+                        f"quantile_cont({self.measure}, [0.25, 0.75]) AS q FROM {self.scan}{self.where}",
+                        self.params).iloc[0]
+        self.n = int(row["n"])
+        self.lo, self.hi = (float(row["lo"]), float(row["hi"])) if self.n else (0.0, 0.0)
+        self.q1, self.q3 = (float(v) for v in row["q"]) if self.n else (float("nan"), float("nan"))
+        self._segments = {}
+
+    def __len__(self):
+        return self.n
+
+    def _rows(self, extra=None):
+        # the selection's predicate, optionally ANDed with `extra`
+        if not extra:
+            return self.where
+        return f"{self.where} AND {extra}" if self.where else f" WHERE {extra}"
+
+    def quantile(self, q):
+        if self.n == 0:
+            return float("nan")
+        return float(self.query._df(f"SELECT quantile_cont({self.measure}, {float(q)!r}) AS q "
+                                    f"FROM {self.scan}{self.where}", self.params)["q"].iloc[0])
+
+    def fence(self, mult=1.5):
+        return self.q1, self.q3, self.q3 + mult * (self.q3 - self.q1)
+
+    def count_above(self, threshold):
+        return int(self.query._df(f"SELECT count(*) AS n FROM {self.scan}{self._rows(f'{self.measure} > ?')}",
+                                  [*self.params, float(threshold)])["n"].iloc[0])
+
+    def counts_above(self, threshold, col):
+        out = self.query._df(f"SELECT {_col(col)} AS v, count(*) AS n FROM {self.scan}"
+                             f"{self._rows(f'{self.measure} > ?')} GROUP BY ALL",
+                             [*self.params, float(threshold)])
+        counts = dict(zip(out["v"], out["n"]))
+        labels = self.values[col]
+        return pd.DataFrame({col: labels, "Count": [int(counts.get(v, 0)) for v in labels]})
+
+    def histogram(self, threshold, bins=50):
+        # the same edges np.histogram_bin_edges gives, bins counted in the scan
+        lo, hi = (self.lo, self.hi) if self.n else (0.0, 1.0)
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        edges = np.linspace(lo, hi, bins + 1)
+        out = self.query._df(
+            f"SELECT least(CAST(floor(({self.measure} - ?) / ? * {int(bins)}) AS BIGINT), {int(bins) - 1}) AS b, "
+            f"{self.measure} > ? AS vip, count(*) AS n FROM {self.scan}{self.where} GROUP BY ALL",
+            [lo, hi - lo, float(threshold), *self.params])
+        counts = {"Normal": np.zeros(bins, dtype=np.int64), "VIP": np.zeros(bins, dtype=np.int64)}
+        for vip, part in out.groupby("vip"):
+            np.add.at(counts["VIP" if vip else "Normal"], part["b"].to_numpy(dtype=np.intp), part["n"].to_numpy())
+        return edges, counts
+
+    def segments(self, by):
+        by = tuple(by)
+        if by not in self._segments:
+            self._segments[by] = ScannedSegments(self, by)
+        return self._segments[by]
+
+
+class ScannedSegments:
+    # anomaly.SegmentFences answered by queries: the quartiles of every
+    # segment in one GROUP BY, the rows above their segment's fence by
+    # joining the scan to those quartiles
+
+    def __init__(self, sp, by):
+        self.sp = sp
+        self.by = list(by)
+        self.keys = "".join(f"{_col(c)}, " for c in self.by)
+        self.table = self._fenced("count(*) AS count", tail=False, cte=False)
+
+    def _fenced(self, select, tail, cte=True, mult=1.5):
+        # `select` per segment (GROUP BY the segment columns), over the rows
+        # above their fence when `tail`
+        sp = self.sp
+        m = sp.measure
+        quartiles = f"quantile_cont({m}, 0.25) AS q1, quantile_cont({m}, 0.75) AS q3"
+        if not cte:
+            sql = f"SELECT {self.keys}{select}, {quartiles} FROM {sp.scan}{sp.where} GROUP BY ALL"
+            params = sp.params
+        else:
+            join = f"JOIN f USING ({self.keys[:-2]})" if self.by else "CROSS JOIN f"
+            where = sp._rows(f"{m} > f.q3 + {float(mult)!r} * (f.q3 - f.q1)") if tail else sp.where
+            sql = (f"WITH f AS (SELECT {self.keys}{quartiles} FROM {sp.scan}{sp.where} GROUP BY ALL) "
+                   f"SELECT {self.keys}{select} FROM {sp.scan} {join}{where} GROUP BY ALL")
+            params = [*sp.params, *sp.params]
+        out = sp.query._categorical(sp.query._df(sql, params))
+        out = out.sort_values(self.by).reset_index(drop=True) if self.by else out
+        for col in self.by:
+            # plain labels in category order, as SegmentFences has them
+            out[col] = out[col].astype(object)
+        return out
+
+    def __len__(self):
+        return len(self.sp)
+
+    def fences(self, mult=1.5):
+        out = self.table.copy()
+        out["upper"] = out["q3"] + mult * (out["q3"] - out["q1"])
+        tail = self._fenced("count(*) AS above", tail=True, mult=mult)
+        out["above"] = out.merge(tail, on=self.by, how="left")["above"].fillna(0).astype(np.int64) \
+            if self.by else int(tail["above"].sum())
+        return out
+
+    def count_above(self, mult=1.5):
+        return int(self._fenced("count(*) AS n", tail=True, mult=mult)["n"].sum())
+
+    def histogram(self, mult=1.5, bins=50):
+        sp = self.sp
+        lo, hi = (sp.lo, sp.hi) if sp.n else (0.0, 1.0)
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        edges = np.linspace(lo, hi, bins + 1)
+        b = f"least(CAST(floor(({sp.measure} - {lo!r}) / {hi - lo!r} * {int(bins)}) AS BIGINT), {int(bins) - 1}) AS b"
+        vip = f"{sp.measure} > f.q3 + {float(mult)!r} * (f.q3 - f.q1) AS vip"
+        out = self._fenced(f"{b}, {vip}, count(*) AS n", tail=False, mult=mult)
+        counts = {"Normal": np.zeros(bins, dtype=np.int64), "VIP": np.zeros(bins, dtype=np.int64)}
+        for flag, part in out.groupby("vip"):
+            np.add.at(counts["VIP" if flag else "Normal"], part["b"].to_numpy(dtype=np.intp), part["n"].to_numpy())
+        return edges, counts
+
+    def counts_above(self, mult, col):
+        out = self._fenced(f"{_col(col)} AS v, count(*) AS n", tail=True, mult=mult)
+        counts = out.groupby("v")["n"].sum().to_dict()
+        labels = self.sp.values[col]
+        return pd.DataFrame({col: labels, "Count": [int(counts.get(v, 0)) for v in labels]})
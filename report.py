@@ -0,0 +1,327 @@
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data import BACKEND, CACHE_DIR, DATA_PATH
+
+# ------------------ OFFLINE REPORT ------------------
+# Runs the Stage 3-7 computations once per data version for the default
+# (unfiltered) view and writes a snapshot directory: aggregates, itemsets and
+# rules, customer segments and the anomaly list as Parquet, the Stage 7
+# summary frames, a manifest, and a static HTML report of the charts. The
+# elbow sweep runs on every core, and its curve and the default segment
+# centroids also go into the disk store for the dashboard's Stage 4. Stage 7
+# serves the snapshot of the current version when the sidebar is at its
+# defaults. Run it after each data refresh (files in BF_DROP_DIR included):
+#
+#   python report.py
+#   python report.py --workers 8 --force
+
+REPORT_DIR = os.environ.get("BF_REPORT_DIR", os.path.join(CACHE_DIR, "reports"))
+# the Stage 4 slider's default
+SEGMENT_K = 3
+AGGREGATES = [('Age',), ('Gender',), ('Category',), ('Occupation',), ('Gender', 'Category')]
+ANOMALY_COLUMNS = ['User_ID', 'Age', 'Gender', 'Category', 'Occupation', 'Purchase']
+
+
+def snapshot_dir(key):
+    return os.path.join(REPORT_DIR, f"{key[0]}-{key[1]}")
+
+
+def manifest_path(key):
+    return os.path.join(snapshot_dir(key), "manifest.json")
+
+
+def _frozen_key(sel_key):
+    # JSON lists back to the tuples the dashboard keys on
+    return tuple((col, tuple(vals)) for col, vals in sel_key)
+
+
+def load_summary(key):
+    # the Stage 7 frames of the snapshot for data version `key`, or None
+    try:
+        with open(manifest_path(key)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    out = snapshot_dir(key)
+    return {
+        "sel_key": _frozen_key(manifest["sel_key"]),
+        "created": manifest["created"],
+        "summary": {name: pd.read_parquet(os.path.join(out, f"summary_{name}.parquet"))
+                    for name in manifest["summary"]},
+    }
+
+
+# ------------------ STAGE 7 SUMMARY ------------------
+# shared by the dashboard page (live, or from a snapshot) and the HTML report
+
+def summary_frames(cube, sp, selection):
+    # the data of Stage 7's three summary charts, for any selection; `cube`
+    # may be an approx.StratifiedSample, whose 95% intervals come along as CI
+    by_age = cube.rollup("Age", selection)
+    age_spend = by_age[['Age', 'mean']].rename(columns={'mean': 'Purchase'})
+    if 'mean_ci' in by_age:
+        age_spend['CI'] = by_age['mean_ci']
+
+    gender_pref = cube.rollup(["Gender", "Category"], selection)[["Gender", "Category", 'count']]
+    gender_pref = gender_pref.rename(columns={'count': "Count"})
+
+    # same sorted structure (or backend query) as Stage 6, no re-sort of the rows
+    Q1, Q3, upper = sp.fence(1.5)
+    anomaly_gender = sp.counts_above(upper, "Gender")
+    anomaly_gender = anomaly_gender[anomaly_gender["Count"] > 0]
+
+    return {"age_spend": age_spend, "gender_pref": gender_pref, "anomaly_gender": anomaly_gender}
+
+
+def summary_figures(frames):
+    import plotly.express as px
+
+    # ---- Chart 1 ----
+    fig1 = px.bar(
+        frames["age_spend"],
+        x="Age",
+        y="Purchase",
+        error_y="CI" if "CI" in frames["age_spend"] else None,
+        color="Purchase",
+        title="Average Spend by Age Group",
+        template="plotly_dark"
+    )
+
+    # ---- Chart 2 ----
+    fig2 = px.bar(
+        frames["gender_pref"],
+        x="Category",
+        y="Count",
+        color="Gender",
+        barmode="group",
+        title="Product Preference by Gender",
+        template="plotly_dark"
+    )
+
+    # ---- Chart 3 ----
+    fig3 = px.pie(
+        frames["anomaly_gender"],
+        names="Gender",
+        values="Count",
+        title="Demographic of Anomaly Spenders",
+        template="plotly_dark"
+    )
+    return [fig1, fig2, fig3]
+
+
+# ------------------ COMPUTATIONS ------------------
+
+def _open(path):
+    # the same version the dashboard serves: base data plus the drop files
+    if BACKEND == "duckdb":
+        from query import ParquetQuery as Dataset
+    else:
+        from live import Dataset
+    ds = Dataset(path)
+    ds.poll(every=0)
+    return ds
+
+
+def _strings(df):
+    # itemsets / rules hold frozensets, which Parquet cannot store
+    df = df.copy()
+    for col in ("itemsets", "antecedents", "consequents"):
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: ', '.join(sorted(x)))
+    return df
+
+
+def compute(ds, workers):
+    import charts
+    import store
+    from baskets import mine_cube
+    from clustering import K_RANGE, ModelCache, SEGMENT_LABELS, assign, rank_segments
+    from customers import SEGMENT_FEATURES, feature_matrix
+    from filters import selection_key
+    from jobs import combine_elbow, elbow_task
+
+    query = BACKEND == "duckdb"
+    values = ds.values if query else ds.part("index").values
+    sel_key = selection_key(values, {})
+    features = SEGMENT_FEATURES
+    tables = {}
+
+    # the elbow sweep fans out over the cores (on the customers' feature
+    # matrix) while the rest runs here
+    users = ds.customer_table({}) if query else ds.part("customers").table()
+    X = feature_matrix(users, features)
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    futures = [pool.submit(elbow_task, X, "Exact", k) for k in K_RANGE]
+
+    # ---- Stage 3 / 7 aggregates ----
+    cube = ds.part("cube")
+    for by in AGGREGATES:
+        tables["agg_" + "_".join(by)] = cube.rollup(list(by))
+    tables["correlations"] = ds.part("comoments").corr().rename_axis("Feature").reset_index()
+    if query:
+        tables["box_stats"] = ds.box_stats({}, "Age", "Purchase", "Gender")
+    else:
+        tables["box_stats"] = charts.box_stats(ds.frame, "Age", "Purchase", "Gender")
+
+    # ---- Stage 5 ----
+    freq, rules = mine_cube(cube)
+    tables["itemsets"] = _strings(freq)
+    tables["rules"] = _strings(rules)
+
+    # ---- Stage 6 ----
+    sp = ds.purchases({}) if query else ds.sorted_purchases(sel_key)
+    Q1, Q3, upper = sp.fence(1.5)
+    if query:
+        tables["anomalies"] = ds.above({}, upper, ANOMALY_COLUMNS)
+    else:
+        frame = ds.frame
+        tables["anomalies"] = frame.loc[frame["Purchase"] > upper, ANOMALY_COLUMNS] \
+            .sort_values("Purchase", ascending=False).reset_index(drop=True)
+
+    # ---- Stage 7 ----
+    summary = summary_frames(cube, sp, {})
+
+    # ---- Stage 4 ----
+    centroids = ModelCache().centroids(ds.key, sel_key, features, SEGMENT_K, X)
+    segment, n_segments = rank_segments(assign(X, centroids), users['Total_Spend'].to_numpy(), SEGMENT_K)
+    users = users.assign(Segment=pd.Categorical.from_codes(segment, SEGMENT_LABELS[:n_segments]))
+    tables["customers"] = users
+
+    ks, wcss = combine_elbow([f.result() for f in futures])
+    pool.shutdown()
+    tables["elbow"] = pd.DataFrame({"K": ks, "WCSS": wcss})
+
+    # the dashboard's Stage 4 finds these instead of recomputing them
+    store.put(ds.key, "elbow", (sel_key, features, "Exact"), (ks, wcss))
+    store.put(ds.key, "centroids", (sel_key, features, SEGMENT_K, None), centroids)
+
+    fence = {"Q1": Q1, "Q3": Q3, "upper": upper, "edges": sp.histogram(upper, bins=charts.HIST_BINS)}
+    return sel_key, tables, summary, fence
+
+
+# ------------------ HTML ------------------
+
+def _figures(tables, summary, fence):
+    import plotly.express as px
+
+    import charts
+    from clustering import find_knee
+
+    ks, wcss = list(tables["elbow"]["K"]), list(tables["elbow"]["WCSS"])
+    elbow = px.line(tables["elbow"], x="K", y="WCSS", markers=True, template=charts.TEMPLATE,
+                    title=f"Elbow Method (knee at k={find_knee(ks, wcss)})")
+    by_cat = tables["agg_Category"]
+    edges, counts = fence["edges"]
+    return [
+        ("Stage 3: Exploratory Data Analysis", [
+            charts.box_figure(tables["box_stats"], x="Age", y="Purchase", color="Gender"),
+            px.bar(by_cat.sort_values("count", ascending=False), x="Category", y="count", color="Category",
+                   title="Most Popular Product Categories", template=charts.TEMPLATE),
+            px.bar(by_cat, x="Category", y="mean", color="mean", color_continuous_scale="viridis",
+                   title="Average Purchase per Category", template=charts.TEMPLATE),
+            px.imshow(tables["correlations"].set_index("Feature"), text_auto=True, color_continuous_scale="RdBu_r",
+                      zmin=-1, zmax=1, title="Correlation Heatmap", template=charts.TEMPLATE),
+        ]),
+        ("Stage 4: Clustering Analysis", [
+            elbow,
+            tables["customers"].groupby("Segment", observed=True)
+            .agg(Customers=("User_ID", "size"), Avg_Total_Spend=("Total_Spend", "mean"),
+                 Avg_Transactions=("Transactions", "mean")).reset_index(),
+        ]),
+        ("Stage 5: Association Rules", [
+            tables["rules"].sort_values("lift", ascending=False).head(20)[
+                ["antecedents", "consequents", "support", "confidence", "lift"]] if len(tables["rules"])
+            else pd.DataFrame(),
+        ]),
+        ("Stage 6: Anomaly Detection", [
+            charts.binned(edges, counts),
+            f"{len(tables['anomalies']):,} VIP transactions above ${fence['upper']:,.0f} "
+            f"(Q1 ${fence['Q1']:,.0f}, Q3 ${fence['Q3']:,.0f}).",
+            tables["anomalies"].head(20),
+        ]),
+        ("Stage 7: Insights & Reporting", summary_figures(summary)),
+    ]
+
+
+def write_html(out_path, title, sections):
+    parts = [f"<!doctype html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title>",
+             "<style>body{background:#0E1117;color:#E5E7EB;font-family:sans-serif;margin:2rem}"
+             "table{border-collapse:collapse}td,th{padding:4px 8px;border:1px solid #333}</style>",
+             f"</head><body><h1>{html.escape(title)}</h1>"]
+    plotlyjs = True
+    for heading, items in sections:
+        parts.append(f"<h2>{html.escape(heading)}</h2>")
+        for item in items:
+            if isinstance(item, pd.DataFrame):
+                parts.append(item.to_html(index=False, float_format=lambda v: f"{v:,.3f}"))
+            elif isinstance(item, str):
+                parts.append(f"<p>{html.escape(item)}</p>")
+            else:
+                # plotly.js is embedded once, so the file works offline
+                parts.append(item.to_html(full_html=False, include_plotlyjs=plotlyjs))
+                plotlyjs = False
+    parts.append("</body></html>")
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+
+# ------------------ SNAPSHOT ------------------
+
+def build(path=DATA_PATH, workers=None, force=False):
+    ds = _open(path)
+    out = snapshot_dir(ds.key)
+    if os.path.exists(os.path.join(out, "manifest.json")) and not force:
+        return out, False
+
+    t0 = time.perf_counter()
+    sel_key, tables, summary, fence = compute(ds, workers or os.cpu_count())
+
+    # written next to the final directory and renamed into place
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    tmp = f"{out}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, df in tables.items():
+        df.to_parquet(os.path.join(tmp, f"{name}.parquet"), index=False)
+    for name, df in summary.items():
+        df.to_parquet(os.path.join(tmp, f"summary_{name}.parquet"), index=False)
+    created = time.strftime("%Y-%m-%d %H:%M:%S")
+    write_html(os.path.join(tmp, "report.html"), f"Black Friday Retail Analytics — {created}",
+               _figures(tables, summary, fence))
+    manifest = {
+        "key": list(ds.key),
+        "files": list(ds.files),
+        "sel_key": sel_key,
+        "created": created,
+        "seconds": round(time.perf_counter() - t0, 2),
+        "tables": sorted(tables),
+        "summary": sorted(summary),
+    }
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    return out, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the offline report snapshot for the current data.")
+    parser.add_argument("--data", default=DATA_PATH, help="data file (default: BF_DATA or the synthetic demo)")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the elbow sweep (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if this version has a snapshot")
+    args = parser.parse_args()
+    out, built = build(args.data, args.workers, args.force)
+    print(("wrote " if built else "up to date: ") + out)
+
+
+if __name__ == "__main__":
+    main()
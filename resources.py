@@ -0,0 +1,263 @@
+import os
+
+import streamlit as st
+
+import perf
+import store
+from artifacts import ARTIFACTS
+from data import BACKEND, DATA_PATH, memory_report
+
+# ------------------ SHARED RESOURCES ------------------
+# Everything cached across reruns and sessions. scikit-learn, mlxtend and the
+# cubes are imported inside the loaders, so they load with the first page
+# that needs them rather than with the app. Results that are expensive to
+# recompute are also kept in the on-disk store, so a restart or another
+# worker process on the host picks them up instead of recomputing.
+
+
+@st.cache_resource
+def _dataset(path):
+    # CSV exports are ingested once into a Parquet cache (with Age_Code and
+    # Scaled precomputed) and memory-mapped on later starts. Held once per
+    # process with read-only buffers; sessions address it by row positions.
+    # Files already in the drop directory are replayed onto it here.
+    from live import Dataset
+    live = Dataset(path)
+    live.poll(every=0)
+    store.invalidate(live.key, live.data_files)
+    return live
+
+
+def dataset(path=DATA_PATH):
+    # always called with the path itself: cache_resource keys on the call's
+    # arguments, so dataset() and dataset(path) would build two copies
+    return _dataset(path)
+
+
+@st.cache_resource
+def _backend(path):
+    from query import ParquetQuery
+    q = ParquetQuery(path)
+    q.poll(every=0)
+    store.invalidate(q.key, q.data_files)
+    return q
+
+
+def backend(path=DATA_PATH):
+    # with BF_BACKEND=duckdb, the query backend over the Parquet cache that
+    # stands in for the loaded frame (one per process, like dataset); None
+    # otherwise
+    if BACKEND != "duckdb":
+        return None
+    return _backend(path)
+
+
+def current(path=DATA_PATH):
+    # whichever holds the current version: the backend or the loaded dataset
+    return backend(path) or dataset(path)
+
+
+def load(path=DATA_PATH):
+    return dataset(path).frame
+
+
+def dataset_key(path=DATA_PATH):
+    # disk store key of the current version; entries of older ones are dropped
+    return current(path).key
+
+
+def data_version(path=DATA_PATH):
+    # what the in-process caches key on: the dataset key (source path, size
+    # and mtime, applied files) plus the version counter, which starts again
+    # at 0 whenever the dataset is rebuilt
+    ds = current(path)
+    return ds.key, ds.version
+
+
+@st.cache_data(max_entries=4)
+def _memory_report(version, path=DATA_PATH):
+    return memory_report(load(path))
+
+
+def load_memory_report(path=DATA_PATH):
+    return _memory_report(data_version(path), path)
+
+
+def load_index(path=DATA_PATH):
+    # built once per process and extended on append, shared by every session
+    return dataset(path).part("index")
+
+
+def load_cube(path=DATA_PATH):
+    return current(path).part("cube")
+
+
+def load_comoments(path=DATA_PATH):
+    return current(path).part("comoments")
+
+
+def load_sample(path=DATA_PATH):
+    # the stratified sample behind approximate mode, drawn on first use and
+    # kept (and extended on append) like the cube
+    return current(path).part("sample")
+
+
+def artifact(kind, sel_key, compute, *params, path=DATA_PATH):
+    # what a page computed for a canonical filter selection (and params),
+    # shared by every session until the data version changes
+    key = (kind, sel_key, params, data_version(path))
+    return ARTIFACTS.get(key, compute)
+
+
+def scan(method, sel_key, *args, path=DATA_PATH):
+    # a backend query's (small) result, shared per selection and version
+    def run():
+        with perf.span(f"query {method}"):
+            return getattr(backend(path), method)(dict(sel_key), *args)
+    return artifact(f"query {method}", sel_key, run, *args, path=path)
+
+
+@st.cache_resource
+def job_runner():
+    from jobs import JobRunner
+    return JobRunner()
+
+
+def _background(owner, stage, params, tasks, combine, path=DATA_PATH):
+    # a finished job (in memory or in the disk store), else the running or a
+    # newly submitted one; the result is written to the store when it lands
+    ds = dataset_key(path)
+    key = (stage, ds, params)
+    runner = job_runner()
+    if runner.lookup(key) is None:
+        value = store.get(ds, stage, params)
+        if value is not None:
+            runner.remember(key, value)
+    return runner.submit((owner, stage), key, tasks, combine,
+                         on_done=lambda value: store.put(ds, stage, params, value))
+
+
+def elbow(owner, sel_key, features, mode, fraction=None, path=DATA_PATH):
+    from approx import customer_sample
+    from clustering import K_RANGE
+    from customers import feature_matrix
+    from jobs import combine_elbow, elbow_task
+
+    # keyed on the canonical filter selection, not on the feature matrix;
+    # one task per k so the sweep reports progress. fraction: approximate
+    # mode's sampling rate, applied to the customers
+    def tasks():
+        # the workers get the selection's feature matrix, not the dataset.
+        # It is standardized over every customer before sampling, as Stage 4's
+        # fit is, so sampled and exact curves are on the same scale
+        table = customer_table(sel_key, path)
+        X = feature_matrix(table, features)
+        scale = 1.0
+        if fraction is not None:
+            rows = customer_sample(table, fraction)
+            scale = len(table) / max(len(rows), 1)
+            X = X[rows]
+        return [(elbow_task, (X, mode, k, scale)) for k in K_RANGE]
+
+    params = (sel_key, features, mode) if fraction is None else (sel_key, features, mode, fraction)
+    return _background(owner, "elbow", params, tasks, combine_elbow, path)
+
+
+def mined(sel_key, path=DATA_PATH):
+    # itemset counts are roll-ups of the cube, so they follow every append
+    from baskets import mine_cube
+
+    def run():
+        with perf.span("itemsets from cube"):
+            return mine_cube(load_cube(path), dict(sel_key))
+    return artifact("itemsets", sel_key, run, path=path)
+
+
+def load_customers(path=DATA_PATH):
+    return dataset(path).part("customers")
+
+
+def _customer_table(sel_key, path=DATA_PATH):
+    if backend(path) is not None:
+        with perf.span("customer features"):
+            return backend(path).customer_table(dict(sel_key))
+    rows = load_index(path).rows(dict(sel_key))
+    base = load(path)
+    with perf.span("customer features"):
+        if len(rows) == len(base):
+            return load_customers(path).table()
+        return load_customers(path).table(base, rows)
+
+
+def customer_table(sel_key, path=DATA_PATH):
+    # one row per customer, aggregated over the selected transactions
+    return artifact("customers", sel_key, lambda: _customer_table(sel_key, path), path=path)
+
+
+def sorted_purchases(sel_key, path=DATA_PATH):
+    # shared by Stage 6 and Stage 7 for the same filter selection, and
+    # patched (not re-sorted) when transactions are appended
+    with perf.span("sort purchases"):
+        return dataset(path).sorted_purchases(sel_key)
+
+
+def purchases(sel_key, path=DATA_PATH):
+    # fences, tail counts and histograms of Purchase for Stages 6 and 7
+    if backend(path) is not None:
+        return scan("purchases", sel_key, path=path)
+    return sorted_purchases(sel_key, path)
+
+
+@st.cache_resource(max_entries=2)
+def _frame_scores(version, path=DATA_PATH):
+    # every row's IsolationForest score, once per data version; selections
+    # take theirs by row position
+    ds = dataset(path)
+    with perf.span("isolation forest"):
+        return ds.part("iforest").score_frame(ds.frame)
+
+
+def isolation_scores(sel_key, path=DATA_PATH):
+    # IsolationForest scores of the selected rows (lower = more anomalous)
+    if backend(path) is not None:
+        return scan("scores", sel_key, path=path)
+    scores = _frame_scores(data_version(path), path)
+    rows = load_index(path).rows(dict(sel_key))
+    return scores if len(rows) == len(scores) else scores[rows]
+
+
+@st.cache_data(max_entries=4)
+def _report_summary(key, mtime):
+    from report import load_summary
+    return load_summary(key)
+
+
+def report_snapshot(sel_key, path=DATA_PATH):
+    # the offline report's Stage 7 frames when one was written for the
+    # current data version and `sel_key` is the view it covers; else None
+    from report import manifest_path
+
+    key = dataset_key(path)
+    try:
+        mtime = os.path.getmtime(manifest_path(key))
+    except FileNotFoundError:
+        return None
+    snapshot = _report_summary(key, mtime)
+    if snapshot is None or snapshot["sel_key"] != sel_key:
+        return None
+    return snapshot
+
+
+@st.cache_resource
+def model_cache():
+    from clustering import ModelCache
+    return ModelCache()
+
+
+def centroids(sel_key, features, k, X, fraction=None, path=DATA_PATH):
+    # fitted centroids survive restarts; a miss fits through the model cache.
+    # fraction: X is approximate mode's sample of the customers, kept apart
+    # from exact fits
+    ds = dataset_key(path)
+    return store.cached(ds, "centroids", (sel_key, features, k, fraction),
+                        lambda: model_cache().centroids(ds, (sel_key, fraction), features, k, X))
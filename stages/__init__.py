@@ -0,0 +1,60 @@
+import importlib
+
+# ------------------ PAGES ------------------
+# One module per sidebar page, imported the first time the page is opened so
+# its heavy dependencies stay out of the other pages' reruns.
+
+PAGES = {
+    "Stage 1: Project Scope": "scope",
+    "Stage 2: Data Preprocessing": "preprocessing",
+    "Stage 3: EDA": "eda",
+    "Stage 4: Clustering Analysis": "clusters",
+    "Stage 5: Association Rules": "rules",
+    "Stage 6: Anomaly Detection": "anomalies",
+    "Stage 7: Insights & Reporting": "insights",
+}
+
+
+class PageContext:
+    # what the sidebar resolved for this rerun. `base` is the process-wide
+    # read-only frame; pages gather just the columns they use at `rows`
+    # and keep anything they derive in their own arrays. With the query
+    # backend, `query` is set and `base` / `rows` are None. In approximate
+    # mode `sample` is the stratified sample pages estimate from
+
+    def __init__(self, base, rows, selection, sel_key, cube, session="local", query=None, sample=None):
+        self.base = base
+        self.rows = rows
+        self.selection = selection
+        self.sel_key = sel_key
+        self.cube = cube
+        # owner of this session's background jobs
+        self.session = session
+        self.query = query
+        self.sample = sample
+
+    def __len__(self):
+        if self.rows is None:
+            return self.cube.totals(self.selection)["count"]
+        return len(self.rows)
+
+    @property
+    def full(self):
+        return len(self.rows) == len(self.base)
+
+    def values(self, col):
+        values = self.base[col].to_numpy()
+        return values if self.full else values[self.rows]
+
+    def frame(self, columns, positions=None):
+        # columns at the selected rows (or at `positions` within them); with
+        # every row selected this is a view of the shared frame, not a copy
+        rows = self.rows if positions is None else self.rows[positions]
+        if positions is None and self.full:
+            return self.base[list(columns)]
+        return self.base[list(columns)].take(rows)
+
+
+def render(page, ctx):
+    module = importlib.import_module(f"stages.{PAGES[page]}")
+    module.render(ctx)
@@ -0,0 +1,68 @@
+import numpy as np
+import streamlit as st
+
+import charts
+from anomaly import SEGMENT_COLUMNS
+from resources import artifact, isolation_scores, purchases
+from ui import card, chart, insight_box
+
+
+def render(ctx):
+    sel_key = ctx.sel_key
+
+    st.markdown("""
+    <h1 style='text-align: center; color: #00BFFF;'>
+    Stage 6: Anomaly Detection
+    </h1>
+    """, unsafe_allow_html=True)
+
+    mult = st.slider("Sensitivity",1.0,3.0,1.5)
+    fences = st.radio("Fences", ["Global", "Per segment"], horizontal=True,
+                      help="Per segment: each transaction is compared with its own segment's IQR fence.")
+    sp = purchases(sel_key)
+
+    if fences == "Global":
+        Q1, Q3, upper = sp.fence(mult)
+
+        # the fence splits the sorted array (or the backend's scan): Normal is
+        # the head, VIP the tail; only bin counts are sent
+        edges, counts = sp.histogram(upper, bins=charts.HIST_BINS)
+        fig = charts.binned(edges, counts)
+        chart(fig)
+        card(f"{sp.count_above(upper):,} VIP transactions above ${upper:,.0f} (Q1 ${Q1:,.0f}, Q3 ${Q3:,.0f}).")
+    else:
+        by = st.multiselect("Segment by", SEGMENT_COLUMNS, ['Age', 'Category'])
+        # quartiles of every segment from one regrouping of the sorted
+        # values, kept with them in the anomaly cache; the counts for a
+        # multiplier are shared across sessions
+        seg = sp.segments(by)
+        edges, counts, table = artifact("segment fences", sel_key,
+                                        lambda: (*seg.histogram(mult, bins=charts.HIST_BINS), seg.fences(mult)),
+                                        tuple(by), mult)
+        chart(charts.binned(edges, counts))
+        card(f"{int(table['above'].sum()):,} VIP transactions above their segment's fence, "
+             f"across {len(table):,} segments.")
+        with st.expander("Fences per segment"):
+            st.dataframe(table, hide_index=True)
+
+    insight_box(
+    "Anomaly detection highlights high-value customers whose spending significantly exceeds the norm. "
+    "These 'VIP' customers contribute disproportionately to revenue and should be prioritized for "
+    "exclusive deals, premium services, and retention strategies."
+    )
+
+    # ---------------- MULTIVARIATE SCORING ----------------
+    st.markdown("### 🌲 Multivariate Scoring")
+    if st.toggle("Score with an IsolationForest (Purchase, age, gender, occupation)"):
+        share = st.slider("Flagged share (%)", 0.5, 10.0, 1.0)
+        # trained once per dataset and scored in batches; a selection only
+        # picks its rows' scores
+        scores = isolation_scores(sel_key)
+        threshold = float(np.quantile(scores, share / 100)) if len(scores) else 0.0
+        outlier = scores <= threshold
+        edges = np.histogram_bin_edges(scores, bins=charts.HIST_BINS)
+        counts = {"Normal": np.histogram(scores[~outlier], edges)[0],
+                  "Outlier": np.histogram(scores[outlier], edges)[0]}
+        chart(charts.binned(edges, counts, x="Score"))
+        card(f"{int(outlier.sum()):,} transactions scored at or below {threshold:.3f} "
+             f"(lower is more unusual).")
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+import charts
+import perf
+from clustering import ELBOW_MODES, LARGE_ROWS, SEGMENT_LABELS, assign, find_knee, rank_segments
+from customers import SEGMENT_FEATURES, feature_matrix
+from approx import customer_sample
+from resources import centroids, customer_table, dataset_key, elbow
+from ui import background, chart, insight_box
+
+
+def show_elbow(curve):
+    K_range, wcss = curve
+
+    # Create DataFrame for plotting
+    elbow_df = pd.DataFrame({
+        "K": list(K_range),
+        "WCSS": wcss
+    })
+
+    # Plot
+    fig_elbow = px.line(
+        elbow_df,
+        x="K",
+        y="WCSS",
+        markers=True,
+        template='plotly_dark',
+        title="Elbow Method"
+    )
+
+    # Highlight the detected knee
+    knee = find_knee(K_range, wcss)
+    fig_elbow.add_annotation(
+        x=knee,
+        y=wcss[K_range.index(knee)],
+        text=f"Elbow Point (k={knee})",
+        showarrow=True,
+        arrowhead=2
+    )
+
+    # ✅ FIXED INDENTATION (inside block)
+    chart(fig_elbow)
+
+    insight_box(
+        f"The Elbow Method shows a sharp drop in WCSS until K={knee}, after which improvements slow down. "
+        f"This indicates that {knee} clusters provide an optimal balance between model simplicity and accuracy."
+    )
+
+
+def render(ctx):
+    sel_key = ctx.sel_key
+
+    st.markdown("""
+    <h1 style='text-align: center; color: #00BFFF;'>
+    Stage 4: Clustering Analysis
+    </h1>
+    """, unsafe_allow_html=True)
+
+
+    st.markdown("### 📉 Elbow Method (Optimal Clusters)")
+
+    # customers, not transactions: one row per User_ID with their spend,
+    # transaction count and (modal) age group over the selected rows
+    features = SEGMENT_FEATURES
+    users = customer_table(sel_key)
+    st.caption(f"Segmenting {len(users):,} customers from {len(ctx):,} transactions "
+               f"on {', '.join(features)} (standardized).")
+    # KMeans needs at least as many customers as the largest K below
+    if len(users) < 5:
+        st.warning("Not enough customers in this selection to cluster. Widen the filters.")
+        return
+
+    # approximate mode sweeps and fits on customers sampled by age group and
+    # gender at the transaction sample's rate, then labels all of them
+    approx = ctx.sample is not None
+    fraction = ctx.sample.fraction if approx else None
+    if approx:
+        fit_rows = customer_sample(users, fraction)
+        st.caption(f"⚡ Approximate: fitting on {len(fit_rows):,} of {len(users):,} customers "
+                   f"(stratified by age group and gender).")
+    mode = st.radio("Elbow mode", ELBOW_MODES, horizontal=True,
+                    help="MiniBatch and Sampled trade a little accuracy for speed on large frames.")
+    if mode == "Exact" and len(users) > LARGE_ROWS:
+        st.caption(f"{len(users):,} customers selected — MiniBatch or Sampled mode will be much faster.")
+
+    # a background job per (filter selection, features, mode), one task per k;
+    # sessions asking for the same curve share it, a new selection supersedes it
+    background(elbow(ctx.session, sel_key, features, mode, fraction), "elbow", "Fitting elbow curve", show_elbow)
+
+        # ---------------- INTERACTIVE CLUSTERING ----------------
+    st.markdown("### 🎛️ Interactive Clustering & Segmentation")
+
+    # Slider for selecting number of clusters
+    k = st.slider("Select Number of Clusters (K)", 2, 5, 3)
+
+    # Segment codes (one per customer) are this session's own small array,
+    # kept for the current (data version, selection, k); the shared tables
+    # are never written
+    key = (dataset_key(), sel_key, features, k, fraction)
+    derived = st.session_state.get("segments")
+    if derived is None or derived[0] != key:
+        # Features for clustering
+        X = feature_matrix(users, features)
+
+        # Centroids come from the disk store / model cache (warm-started refit on a miss);
+        # customers are labelled by a vectorized nearest-centroid lookup
+        with perf.span("kmeans"):
+            fit = X[fit_rows] if approx else X
+            fitted = centroids(sel_key, features, k, fit, fraction)
+        cluster = assign(X, fitted)
+
+        # Sort clusters by spending to label them meaningfully
+        segment, n_segments = rank_segments(cluster, users['Total_Spend'].to_numpy(), k)
+        derived = (key, segment, n_segments)
+        st.session_state["segments"] = derived
+    _, segment, n_segments = derived
+    labels = SEGMENT_LABELS[:n_segments]
+
+    # Scatter Plot
+    shown = charts.sample_rows(segment, budget=5_000)
+    points = users[['Age', 'Total_Spend', 'Transactions']].take(shown)
+    points['Segment'] = np.array(labels, dtype=object)[segment[shown]]
+    fig = charts.scatter(
+        points,
+        x="Age",
+        y="Total_Spend",
+        hover_data=["Transactions"],
+        color="Segment",
+        budget=5_000,
+        total=len(segment),
+        title="Customer Segments Based on Spending Behavior"
+    )
+
+    chart(fig)
+
+    # Insight: segments are ranked by average spend, so the last is the top one
+    top_segment = labels[-1]
+
+    insight_box(
+        f"The '{top_segment}' segment represents the highest spending customers. "
+        "These users contribute significantly to revenue and should be targeted with "
+        "premium offerings, loyalty programs, and personalized marketing strategies. "
+        "Lower segments can be nurtured through discounts and engagement campaigns to increase spending."
+    )
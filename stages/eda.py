@@ -0,0 +1,140 @@
+import plotly.express as px
+import streamlit as st
+
+import charts
+from resources import artifact, load_comoments, scan
+from ui import chart, insight_box, section
+
+
+def render(ctx):
+    selection, sel_key, cube, sample = ctx.selection, ctx.sel_key, ctx.cube, ctx.sample
+    approx = sample is not None
+
+    def rows():
+        # only the columns the row-level charts below need, gathered on a
+        # cache miss; approximate mode draws the sampled rows
+        if approx:
+            return sample.rows(selection, ['Age', 'Gender', 'Occupation', 'Purchase'])
+        return ctx.frame(['Age', 'Gender', 'Occupation', 'Purchase'])
+
+    st.markdown("""
+    <h1 style='text-align: center; color: #00BFFF;'>
+    Stage 3: Exploratory Data Analysis
+    </h1>
+    """, unsafe_allow_html=True)
+
+    section("Purchase Distribution")
+    # quartiles/whiskers per group are computed here (or in the backend's
+    # scan) once per selection for every session; only those reach the browser
+    if approx or ctx.query is None:
+        stats = artifact("box stats", sel_key, lambda: charts.box_stats(rows(), "Age", "Purchase", "Gender"), approx)
+    else:
+        stats = scan("box_stats", sel_key, "Age", "Purchase", "Gender")
+    fig = charts.box_figure(stats, x="Age", y="Purchase", color="Gender")
+    chart(fig)
+    insight_box(
+    "Customers aged 26–45 show the highest spending range and median purchases. "
+    "Male customers also display wider variability, indicating more high-value transactions."
+    )
+
+    # ------------------------------
+    # Most Popular Product Categories
+    st.markdown("### 2. Most Popular Product Categories")
+
+    # approximate mode: estimates with 95% intervals as error bars (the
+    # counts are exact, Category being a sampling stratum)
+    by_cat = artifact("category rollup", sel_key,
+                      lambda: sample.rollup('Category', selection) if approx else cube.rollup('Category', selection),
+                      approx)
+
+    cat_counts = by_cat[['Category', 'count']].sort_values('count', ascending=False)
+    cat_counts.columns = ['Category', 'Number of Purchases']
+
+    fig2 = px.bar(
+        cat_counts,
+        x='Category',
+        y='Number of Purchases',
+        color='Category',
+        template='plotly_dark'
+    )
+
+    chart(fig2)
+    insight_box(
+    "Certain product categories dominate purchase frequency, indicating strong demand trends. "
+    "Retailers should prioritize inventory and marketing efforts toward these high-volume categories."
+    )
+
+    # ------------------------------
+    # Average Purchase per Category
+    st.markdown("### 3. Average Purchase per Category")
+
+    cat_avg = by_cat[['Category', 'mean']].rename(columns={'mean': 'Purchase'})
+    if approx:
+        cat_avg['CI'] = by_cat['mean_ci']
+
+    fig3 = px.bar(
+        cat_avg,
+        x='Category',
+        y='Purchase',
+        error_y='CI' if approx else None,
+        color='Purchase',
+        color_continuous_scale='viridis',
+        template='plotly_dark'
+    )
+
+    chart(fig3)
+    insight_box(
+    "Some categories generate higher average transaction values despite lower purchase counts. "
+    "These categories represent premium segments and offer strong revenue potential per sale."
+    )
+
+    # ------------------------------
+    # Scatter Plot: Purchase vs Occupation
+    st.markdown("### 4. Scatter Plot: Purchase vs. Occupation")
+
+    # the shown points are drawn once per selection (in the scan with the
+    # query backend); the sample is already within budget
+    if approx or ctx.query is None:
+        points = artifact("scatter points", sel_key,
+                          lambda: charts.sample(rows()[['Occupation', 'Purchase', 'Gender']], 'Gender', 5_000), approx)
+    else:
+        points = scan("sample", sel_key, ('Occupation', 'Purchase', 'Gender'), 5_000)
+    total = len(ctx)
+    fig4 = charts.scatter(
+        points,
+        x='Occupation',
+        y='Purchase',
+        color='Gender',
+        budget=5_000,
+        total=total,
+        opacity=0.6
+    )
+
+    chart(fig4)
+    insight_box(
+    "Spending patterns vary across occupation groups, with certain occupations showing consistently higher purchases. "
+    "This suggests income-level influence on spending behavior and potential for targeted marketing."
+    )
+
+    # ------------------------------
+    # Correlation Heatmap for Key Features
+    st.markdown("### 5. Correlation Heatmap for Key Features")
+
+    # Merged from per-cell co-moments (counts, sums, cross-products) of the
+    # numeric features that exist in the dataset, no pass over the rows
+    corr_matrix = artifact("correlations", sel_key, lambda: load_comoments().corr(selection))
+
+    fig5 = px.imshow(
+        corr_matrix,
+        text_auto=True,
+        color_continuous_scale='RdBu_r',
+        zmin=-1,
+        zmax=1,
+        template='plotly_dark'
+    )
+
+    chart(fig5)
+    insight_box(
+    "A positive correlation exists between age and purchase amount, indicating increased spending with age. "
+    "Other variables show weaker relationships, suggesting independent influence on purchasing behavior."
+    )
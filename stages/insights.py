@@ -0,0 +1,95 @@
+import streamlit as st
+
+from report import summary_figures, summary_frames
+from resources import artifact, purchases, report_snapshot
+from ui import chart
+
+
+def render(ctx):
+    selection, sel_key, cube = ctx.selection, ctx.sel_key, ctx.cube
+
+    st.markdown("""
+    <h1 style='text-align: center; color: #00BFFF;'>
+    Stage 7: Insights & Reporting
+    </h1>
+    """, unsafe_allow_html=True)
+
+    st.markdown("""
+    <p style='text-align: center; font-size:18px;'>
+    Once analysis is done, we summarize findings in a clear, meaningful way.
+    This section tells the final story of the data.
+    </p>
+    """, unsafe_allow_html=True)
+
+    # ------------------------------
+    # VISUAL EXECUTIVE SUMMARY
+    # ------------------------------
+    st.subheader("📊 Visual Executive Summary")
+
+    # at the default filters, served from the offline report of this data
+    # version (python report.py) when there is one
+    snapshot = report_snapshot(sel_key)
+    if snapshot is not None:
+        frames = snapshot["summary"]
+        st.caption(f"From the offline report of {snapshot['created']}.")
+    else:
+        # approximate mode estimates the bars from the sample; the anomaly
+        # fence stays exact
+        source = cube if ctx.sample is None else ctx.sample
+        frames = artifact("summary", sel_key, lambda: summary_frames(source, purchases(sel_key), selection),
+                          ctx.sample is not None)
+
+    for col, fig in zip(st.columns(3), summary_figures(frames)):
+        with col:
+            chart(fig)
+
+    # ------------------------------
+    # FINAL ANSWERS
+    # ------------------------------
+    st.markdown("---")
+    st.header("🔑 Final Answers to Core Questions")
+
+    # ---- Q1 ----
+    st.markdown("""
+    <div style='background-color:#1e1e1e;
+                padding:20px;
+                border-radius:10px;
+                border-left:5px solid #00FFFF;
+                margin-bottom:25px;'>
+    <h3 style='color:#00FFFF;'>1. Which age group spends the most?</h3>
+    <p>
+    Middle-aged groups (26–45) typically spend the most due to higher income and purchasing power.
+    </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # ---- Q2 ----
+    st.markdown("""
+    <div style='background-color:#1e1e1e;
+                padding:20px;
+                border-radius:10px;
+                border-left:5px solid #FF4B6E;
+                margin-bottom:25px;'>
+    <h3 style='color:#FF4B6E;'>2. Which products are popular with males vs. females?</h3>
+    <p>
+    • Males prefer Electronics and Sports<br>
+    • Females prefer Apparel, Beauty, and Home
+    </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # ---- Q3 ----
+    st.markdown("""
+    <div style='background-color:#1e1e1e;
+                padding:20px;
+                border-radius:10px;
+                border-left:5px solid #FFD700;
+                margin-bottom:25px;'>
+    <h3 style='color:#FFD700;'>3. What type of buyers spend unusually high amounts?</h3>
+    <p>
+    • Mostly high-income customers<br>
+    • Typically aged 26–45<br>
+    • Represent premium buyer segments
+    </p>
+    </div>
+    """, unsafe_allow_html=True)
@@ -0,0 +1,34 @@
+import streamlit as st
+
+from resources import load_memory_report, scan
+from ui import card, insight_box
+
+
+def render(ctx):
+    st.markdown("""
+    <h1 style='text-align: center; color: #00BFFF;'>
+    Stage 2: Data Preprocessing
+    </h1>
+    """, unsafe_allow_html=True)
+
+    card("Data cleaned, encoded, and scaled.")
+    if ctx.query is None:
+        st.dataframe(ctx.frame(ctx.base.columns, positions=slice(0, 5)))
+    else:
+        st.dataframe(scan("head", ctx.sel_key, 5))
+
+    st.markdown("### 🧮 Memory Footprint per Column")
+    if ctx.query is None:
+        mem = load_memory_report()
+        st.dataframe(mem, use_container_width=True)
+        before, after = mem.iloc[-1][["Before (bytes)", "After (bytes)"]]
+        card(f"Categorical and narrow numeric dtypes cut the frame from {before / 1e6:,.1f} MB "
+             f"to {after / 1e6:,.1f} MB ({before / max(after, 1):,.1f}x smaller).")
+    else:
+        card("The query backend is on (BF_BACKEND=duckdb): the frame is not loaded, "
+             "pages query the compact Parquet cache directly.")
+    insight_box(
+    "The dataset has been cleaned, encoded, and standardized to ensure consistency and accuracy in analysis. "
+    "Scaling purchase values helps improve clustering performance, while encoding categorical variables "
+    "enables machine learning models to interpret customer demographics effectively."
+    )
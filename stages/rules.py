@@ -0,0 +1,70 @@
+import plotly.express as px
+import streamlit as st
+
+from baskets import MIN_CONFIDENCE, MIN_SUPPORT, filter_mined
+from resources import mined
+from ui import chart, insight_box
+
+
+def show_rules(result, support, confidence):
+    freq, rules = filter_mined(*result, support, confidence)
+
+    if not freq.empty:
+
+        if not rules.empty:
+
+            # ✅ FIX: Convert frozenset → string (VERY IMPORTANT)
+            rules['antecedents'] = rules['antecedents'].apply(lambda x: ', '.join(list(x)))
+            rules['consequents'] = rules['consequents'].apply(lambda x: ', '.join(list(x)))
+
+            # ✅ ORIGINAL TABLE
+            st.dataframe(rules)
+
+            # ---------------- VISUALIZATION ----------------
+            st.markdown("### 📊 Visualizing Frequent Product Combinations")
+
+            fig_rules = px.scatter(
+                rules,
+                x="support",
+                y="confidence",
+                size="lift",
+                color="lift",
+                hover_data=["antecedents", "consequents"],
+                template="plotly_dark",
+                title="Rule Strength: Support vs Confidence (Size = Lift)"
+            )
+
+            chart(fig_rules)
+
+            # ✅ Insight
+            insight_box(
+                "This visualization highlights the strength of association rules based on support, confidence, and lift. "
+                "Rules with higher lift and confidence represent strong product relationships and are ideal for "
+                "cross-selling, bundling, and recommendation strategies."
+            )
+
+        else:
+            st.warning("No strong association rules found. Try lowering confidence.")
+
+    else:
+        st.warning("No frequent itemsets found. Try lowering support.")
+
+
+def render(ctx):
+    sel_key = ctx.sel_key
+
+    st.markdown("""
+    <h1 style='text-align: center; color: #00BFFF;'>
+    Stage 5: Association Rules
+    </h1>
+    """, unsafe_allow_html=True)
+
+    support = st.slider("Support", MIN_SUPPORT, 0.2, 0.05)
+    confidence = st.slider("Confidence", MIN_CONFIDENCE, 1.0, 0.5)
+
+    # itemsets/rules come from cube roll-ups once per filter selection (and
+    # data version); the sliders only filter the cached result
+    show_rules(mined(sel_key), support, confidence)
+    if ctx.sample is not None:
+        st.caption("⚡ Supports are exact in approximate mode too: the items (Category, Age, Gender) "
+                   "are the sampling strata, whose counts the cube already holds.")
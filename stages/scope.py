@@ -0,0 +1,34 @@
+import streamlit as st
+
+from ui import section
+
+
+def render(ctx):
+    section("📋 Stage 1: Project Scope, Objectives & Tasks")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("""
+        <div class="dual-card">
+            <h3>🎯 Project Objectives</h3>
+            <ul>
+                <li><b>Primary Goal:</b> Analyze Black Friday sales data to uncover hidden consumer trends, segment customers by purchasing behavior, and identify high-value product combinations.</li>
+                <li><b>Outcome:</b> Deliver actionable business insights that help retailers optimize inventory, improve targeting strategies, and increase overall revenue.</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown("""
+        <div class="dual-card">
+            <h3>🗺️ Project Scope & Tasks</h3>
+            <ul>
+                <li><b>Data Preprocessing:</b> Clean and prepare raw transactional data.</li>
+                <li><b>EDA:</b> Explore patterns between demographics and spending.</li>
+                <li><b>Clustering:</b> Segment customers into meaningful groups.</li>
+                <li><b>Association Rules:</b> Identify cross-selling opportunities.</li>
+                <li><b>Anomaly Detection:</b> Detect high-value outlier customers.</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import pickle
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes stay atomic, only the locks are skipped
+    fcntl = None
+
+from data import CACHE_DIR, fingerprint
+
+# ------------------ DISK RESULT CACHE ------------------
+# Pickled results under CACHE_DIR/results, shared by every worker process on
+# the host and kept across restarts. A file is named after the dataset it was
+# computed from (source + content fingerprint), the stage and a hash of the
+# parameters, so a changed source never matches an old entry. Files are
+# written to a temp name and renamed into place, a hit refreshes the mtime,
+# and the oldest files are evicted once the directory exceeds STORE_MAX_MB.
+#
+#   value = store.cached(dataset, "elbow", (sel_key, features, mode), compute)
+
+STORE_DIR = os.environ.get("BF_STORE_DIR", os.path.join(CACHE_DIR, "results"))
+STORE_MAX_MB = float(os.environ.get("BF_STORE_MB", 1024))
+ENABLED = os.environ.get("BF_STORE", "1") != "0"
+# bump when a cached structure changes shape
+STORE_VERSION = 3
+
+
+def dataset(path):
+    # (source id, content fingerprint) of the file a frame was loaded from
+    source = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    return source, fingerprint(path)
+
+
+def entry_path(ds, stage, params):
+    digest = hashlib.sha1(repr((STORE_VERSION, params)).encode()).hexdigest()[:20]
+    return os.path.join(STORE_DIR, f"{ds[0]}-{ds[1]}-{stage}-{digest}.pkl")
+
+
+@contextmanager
+def _locked(name):
+    # advisory lock on STORE_DIR/<name>.lock, held across processes
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with open(os.path.join(STORE_DIR, f"{name}.lock"), "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def get(ds, stage, params):
+    if not ENABLED:
+        return None
+    path = entry_path(ds, stage, params)
+    try:
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return value
+
+
+def put(ds, stage, params, value):
+    if not ENABLED:
+        return
+    path = entry_path(ds, stage, params)
+    os.makedirs(STORE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    evict()
+
+
+def cached(ds, stage, params, compute):
+    # one process computes a missing entry while the others wait for it
+    if not ENABLED:
+        return compute()
+    value = get(ds, stage, params)
+    if value is not None:
+        return value
+    # 256 lock files, bucketed by the entry's hash, are never removed
+    with _locked("lock-" + entry_path(ds, stage, params)[-6:-4]):
+        value = get(ds, stage, params)
+        if value is None:
+            value = compute()
+            put(ds, stage, params, value)
+    return value
+
+
+def _entries():
+    out = []
+    for entry in os.scandir(STORE_DIR):
+        if entry.name.endswith(".pkl"):
+            try:
+                st_ = entry.stat()
+            except FileNotFoundError:
+                continue
+            out.append((st_.st_mtime, st_.st_size, entry.path))
+    return out
+
+
+def evict(max_mb=STORE_MAX_MB):
+    # least recently used first until the directory fits
+    with _locked("evict"):
+        entries = sorted(_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= max_mb * 2 ** 20:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def invalidate(ds, files):
+    # drop entries of this source from another fingerprint that were last used
+    # before the newest of this version's data files appeared: those belong to
+    # an older version. Anything touched since may be a newer version another
+    # process has moved on to, and is left to the LRU eviction.
+    if not os.path.isdir(STORE_DIR):
+        return 0
+    since = max((os.path.getmtime(f) for f in files if os.path.exists(f)), default=0)
+    removed = 0
+    for mtime, _, path in _entries():
+        source, fp = os.path.basename(path).split("-")[:2]
+        if source == ds[0] and fp != ds[1] and mtime < since:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
@@ -0,0 +1,101 @@
+import argparse
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ------------------ SYNTHETIC TRANSACTIONS ------------------
+# Same shape as the demo frame the dashboard always used, at any size. Chunk i
+# draws from its own Generator seeded with (seed, i), so a chunk is identical
+# no matter which process produces it or in which order.
+
+AGES = ['18-25', '26-35', '36-45', '46-50']
+GENDERS = ['Female', 'Male']
+CATEGORIES = ['Electronics', 'Apparel', 'Home', 'Beauty']
+# middle-aged groups spend more on top of the base distribution
+AGE_BUMP = np.array([0.0, 3000.0, 4000.0, 0.0])
+
+SYNTH_ROWS = 3000
+SYNTH_USERS = 5000
+CHUNK_ROWS = 250_000
+
+
+def generate_chunk(i, n_rows, n_users=SYNTH_USERS, category_mix=None, seed=42, chunk_rows=CHUNK_ROWS):
+    start = i * chunk_rows
+    n = max(0, min(chunk_rows, n_rows - start))
+    rng = np.random.default_rng([seed, i])
+    mix = None if category_mix is None else np.asarray([category_mix[c] for c in CATEGORIES], dtype="float64")
+
+    age = rng.integers(0, len(AGES), n)
+    purchase = np.abs(rng.normal(9000, 3000, n)) + AGE_BUMP[age]
+    return pd.DataFrame({
+        "User_ID": (10000 + rng.integers(0, n_users, n)).astype(np.int32),
+        "Age": pd.Categorical.from_codes(age, AGES, ordered=True),
+        "Gender": pd.Categorical.from_codes(rng.integers(0, len(GENDERS), n), GENDERS),
+        "Occupation": rng.integers(0, 20, n).astype(np.int8),
+        "Category": pd.Categorical.from_codes(
+            rng.choice(len(CATEGORIES), n, p=None if mix is None else mix / mix.sum()), CATEGORIES),
+        "Purchase": purchase,
+    }, index=pd.RangeIndex(start, start + n))
+
+
+def n_chunks(n_rows, chunk_rows=CHUNK_ROWS):
+    return max(1, -(-n_rows // chunk_rows))
+
+
+def generate(n_rows=SYNTH_ROWS, workers=1, chunk_rows=CHUNK_ROWS, **kwargs):
+    # chunks in order; with workers > 1 they are produced by a process pool,
+    # at most 2 * workers at a time so finished chunks wait for the writer
+    # instead of piling up in memory
+    ids = iter(range(n_chunks(n_rows, chunk_rows)))
+    if workers <= 1:
+        for i in ids:
+            yield generate_chunk(i, n_rows, chunk_rows=chunk_rows, **kwargs)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for i in itertools.islice(ids, 2 * workers):
+            pending.append(pool.submit(generate_chunk, i, n_rows, chunk_rows=chunk_rows, **kwargs))
+        while pending:
+            chunk = pending.popleft().result()
+            for i in itertools.islice(ids, 1):
+                pending.append(pool.submit(generate_chunk, i, n_rows, chunk_rows=chunk_rows, **kwargs))
+            yield chunk
+
+
+def synthetic_cache_path(n_rows, n_users=SYNTH_USERS, seed=42):
+    from data import CACHE_DIR, CACHE_VERSION
+    return os.path.join(CACHE_DIR, f"synthetic-{n_rows}-{n_users}-{seed}-v{CACHE_VERSION}.parquet")
+
+
+def write_cache(n_rows, n_users=SYNTH_USERS, category_mix=None, seed=42, workers=1, out_path=None):
+    # generate straight into the columnar cache the dashboard loads
+    from data import ingest_chunks
+    out_path = out_path or synthetic_cache_path(n_rows, n_users, seed)
+    chunks = generate(n_rows, workers=workers, n_users=n_users, category_mix=category_mix, seed=seed)
+    return ingest_chunks(chunks, out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Black Friday transactions into the Parquet cache.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=SYNTH_USERS)
+    parser.add_argument("--mix", help="category mix, e.g. Electronics=0.4,Apparel=0.3,Home=0.2,Beauty=0.1")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", help="output Parquet path (default: the dashboard's cache)")
+    args = parser.parse_args()
+
+    mix = None
+    if args.mix:
+        mix = {k: float(v) for k, v in (kv.split("=") for kv in args.mix.split(","))}
+        mix = {c: mix.get(c, 0.0) for c in CATEGORIES}
+    path = write_cache(args.rows, args.users, mix, args.seed, args.workers, args.out)
+    print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# settings are read from the environment when the modules are imported, so
+# point the caches and the drop directory at a scratch dir before any of them
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH = tempfile.mkdtemp(prefix="bf-tests-")
+os.environ.update({
+    "BF_CACHE_DIR": os.path.join(SCRATCH, "cache"),
+    "BF_DROP_DIR": os.path.join(SCRATCH, "drop"),
+    "BF_DROP_POLL": "0",
+    "BF_ROWS": "3000",
+    "BF_JOB_WAIT": "0",
+})
+sys.path.insert(0, ROOT)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data
+
+
+def raw_export(path, n=2000):
+    # the columns of the public Black Friday export, before normalize
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        "User_ID": 1_000_000 + rng.integers(0, 300, n),
+        "Product_ID": [f"P{i:05d}" for i in rng.integers(0, 200, n)],
+        "Gender": rng.choice(["M", "F"], n),
+        "Age": rng.choice(list(data.AGE_CODES), n),
+        "Occupation": rng.integers(0, 21, n),
+        "Marital_Status": rng.integers(0, 2, n),
+        "Product_Category_1": rng.integers(1, 19, n),
+        "Purchase": rng.integers(200, 24_000, n),
+    }).to_parquet(path, index=False)
+
+
+def test_raw_parquet_is_ingested_for_both_backends(tmp_path):
+    src = str(tmp_path / "bf.parquet")
+    raw_export(src)
+    assert data.parquet_file(src) != src
+    frame = data.load_frame(src)
+    assert {"Category", "Age_Code", "Gender_Code", "Scaled"} <= set(frame.columns)
+    assert set(frame["Gender"]) == {"Male", "Female"}
+
+    pytest.importorskip("duckdb")
+    from query import ParquetQuery
+    values, cube = ParquetQuery(src).snapshot()
+    assert values["Gender"] == ["Female", "Male"]
+    assert int(cube.count.sum()) == len(frame)
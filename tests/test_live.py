@@ -0,0 +1,100 @@
+import os
+import re
+import shutil
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import data
+import resources
+from conftest import ROOT
+from live import DROP_DIR
+from synth import generate_chunk
+
+APP = os.path.join(ROOT, "app.py")
+NEW_ROWS = 500
+
+
+@pytest.fixture(params=["pandas", "duckdb"])
+def backend(request, monkeypatch):
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+    # a fresh process-wide state per backend, with an empty drop directory
+    monkeypatch.setenv("BF_BACKEND", request.param)
+    monkeypatch.setattr(data, "BACKEND", request.param)
+    monkeypatch.setattr(resources, "BACKEND", request.param)
+    shutil.rmtree(DROP_DIR, ignore_errors=True)
+    os.makedirs(DROP_DIR)
+    st.cache_resource.clear()
+    yield request.param
+    st.cache_resource.clear()
+
+
+def drop_new_file(name="new.csv"):
+    # new customers (ids past the synthetic ones), written under a dot-name
+    # and renamed like live.drop does
+    new = generate_chunk(0, NEW_ROWS, seed=7)
+    new["User_ID"] += 90_000
+    tmp = os.path.join(DROP_DIR, f".{name}")
+    new.to_csv(tmp, index=False)
+    os.replace(tmp, os.path.join(DROP_DIR, name))
+
+
+def transactions(at):
+    return int(re.findall(r'kpi-value">([^<]*)', " ".join(m.value for m in at.markdown))[-1])
+
+
+def segmenting(at):
+    caption = next(c.value for c in at.caption if c.value.startswith("Segmenting"))
+    customers, rows = re.match(r"Segmenting ([\d,]+) customers from ([\d,]+) transactions", caption).groups()
+    return int(customers.replace(",", "")), int(rows.replace(",", ""))
+
+
+def test_append_reaches_page_helpers(backend):
+    at = AppTest.from_file(APP, default_timeout=180)
+    at.run()
+    at.sidebar.radio[0].set_value("Stage 4: Clustering Analysis").run()
+    assert not at.exception
+    customers, rows = segmenting(at)
+    assert rows == transactions(at)
+
+    drop_new_file()
+    at.run()
+    assert not at.exception
+    assert transactions(at) == rows + NEW_ROWS
+    # the customer table comes from the same (polled) dataset as the KPIs
+    new_customers, new_rows = segmenting(at)
+    assert new_rows == rows + NEW_ROWS
+    assert new_customers > customers
+    # and this session's segment codes were rebuilt for the new version
+    assert len(at.session_state["segments"][1]) == new_customers
+
+
+def test_malformed_drop_file_is_skipped(backend):
+    # already there when the dataset is built, so the first poll meets it
+    with open(os.path.join(DROP_DIR, "bad.csv"), "w") as f:
+        f.write("a,b\n1,2\n")
+    at = AppTest.from_file(APP, default_timeout=180)
+    at.run()
+    assert not at.exception
+    assert any("bad.csv" in w.value for w in at.sidebar.warning)
+    rows = transactions(at)
+
+    drop_new_file()
+    at.run()
+    assert not at.exception
+    assert transactions(at) == rows + NEW_ROWS
+
+
+def test_artifacts_follow_a_rebuilt_source(backend, tmp_path):
+    # a changed source rebuilt in the same process starts its version count
+    # at 0 again; its artifacts must not be the old source's
+    src = str(tmp_path / "export.csv")
+    generate_chunk(0, 1000, seed=1).to_csv(src, index=False)
+    count = lambda: int(resources.load_cube(src).count.sum())
+    assert resources.artifact("rows", (), count, path=src) == 1000
+
+    generate_chunk(0, 1500, seed=1).to_csv(src, index=False)
+    st.cache_resource.clear()
+    assert resources.artifact("rows", (), count, path=src) == 1500
@@ -0,0 +1,161 @@
+import streamlit as st
+
+import perf
+
+# ------------------ UI STYLING ------------------
+CSS = """
+<style>
+.block-container {
+    padding-top: 2rem;
+    padding-left: 2rem;
+    padding-right: 2rem;
+}
+
+.header {
+    font-size: 2.8rem;
+    font-weight: 800;
+    text-align: center;
+    color: #38BDF8;
+    margin-bottom: 30px;
+}
+
+.card {
+    background: #0F172A;
+    padding: 20px;
+    border-radius: 15px;
+    border: 1px solid rgba(255,255,255,0.05);
+    margin-bottom: 20px;
+}
+
+.kpi-value {
+    font-size: 2rem;
+    font-weight: bold;
+    color: #38BDF8;
+}
+
+.kpi-label {
+    color: #94A3B8;
+}
+
+.kpi-note {
+    font-size: 0.9rem;
+    color: #64748B;
+}
+
+.insight {
+    background: rgba(56,189,248,0.08);
+    border-left: 4px solid #38BDF8;
+    padding: 15px;
+    border-radius: 10px;
+    margin-top: 10px;
+    margin-bottom: 20px;
+    line-height: 1.6;
+    color: #ffffff;
+    white-space: normal;
+    word-wrap: break-word;
+}
+
+.section {
+    font-size: 1.3rem;
+    color: #E5E7EB;
+    margin-bottom: 10px;
+}
+
+/* -------- NEW DUAL CARD -------- */
+.dual-card {
+    background: linear-gradient(145deg, #111827, #1F2937);
+    padding: 25px;
+    border-radius: 18px;
+    border-left: 6px solid #38BDF8;
+    box-shadow: 0 10px 25px rgba(0,0,0,0.4);
+    height: 100%;
+}
+
+.dual-card h3 {
+    color: #E5E7EB;
+    margin-bottom: 15px;
+}
+
+.dual-card ul {
+    padding-left: 20px;
+}
+
+.dual-card li {
+    margin-bottom: 10px;
+    color: #CBD5F5;
+    font-size: 1rem;
+}
+</style>
+"""
+
+
+def inject_css():
+    st.markdown(CSS, unsafe_allow_html=True)
+
+
+# ------------------ UI FUNCTIONS ------------------
+
+def header(text):
+    st.markdown(f'<div class="header">{text}</div>', unsafe_allow_html=True)
+
+
+def card(text):
+    st.markdown(f'<div class="card">{text}</div>', unsafe_allow_html=True)
+
+
+def kpi(label, value, note=None):
+    # note: a small line under the value, e.g. an estimate's error bar
+    note = f'<div class="kpi-note">{note}</div>' if note else ""
+    st.markdown(f"""
+    <div class="card">
+        <div class="kpi-value">{value}</div>
+        {note}
+        <div class="kpi-label">{label}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+# 🔥 MAIN INSIGHT BOX (USE THIS EVERYWHERE)
+def insight_box(text):
+    st.markdown(f'<div class="insight">💡 <b>Insight:</b> {text}</div>', unsafe_allow_html=True)
+
+
+# (Optional — you can remove this later if you want)
+def insight(text):
+    st.markdown(f'<div class="insight">💡 {text}</div>', unsafe_allow_html=True)
+
+
+def section(text):
+    st.markdown(f'<div class="section">{text}</div>', unsafe_allow_html=True)
+
+
+def chart(fig):
+    # figure -> Plotly JSON happens in here, timed separately from the stage
+    with perf.span("plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def background(job, slot, label, show):
+    # render a background job's result; while it runs, show its progress and
+    # this session's last completed result for the same slot instead
+    from jobs import JOB_WAIT_S
+
+    with perf.span(f"wait {slot}"):
+        job.finished.wait(JOB_WAIT_S)
+    if job.done:
+        value = job.result()
+        st.session_state[f"last_{slot}"] = value
+        show(value)
+        return
+
+    @st.fragment(run_every=1.0)
+    def poll():
+        if job.done:
+            st.rerun()
+        st.progress(job.progress, text=f"{label}... {job.elapsed():.0f}s")
+
+    poll()
+    last = st.session_state.get(f"last_{slot}")
+    if last is not None:
+        st.caption("Showing the last completed result until the new one is ready.")
+        show(last)